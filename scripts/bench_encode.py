@@ -0,0 +1,199 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.encoding import x264_args  # noqa: E402
+
+OUT_DIR = Path("out/bench")
+# reported instead of ffmpeg's "inf" when a cell is bit-identical to the reference
+PSNR_IDENTICAL = 100.0
+
+# Kısa, sabit referans girdiler: her hücre aynı içeriği encode eder
+CANNED_MSGS = [
+    ("A", "I almost sent this message. Then I froze."),
+    ("B", "Say it."),
+    ("A", "I realized the 'nice' version of me is just fear with good manners."),
+    ("B", "What if you already outgrew them?"),
+    ("A", "Promise you won't ask me who."),
+]
+
+
+def run(cmd):
+    print(" ".join(map(str, cmd)), flush=True)
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+# -------- reference inputs --------
+
+def make_shorts_inputs(work: Path, seconds: int):
+    """lavfi background clip, canned WhatsApp overlays + timeline, synthetic voice-like audio."""
+    from src.wp_overlay import Msg, render_whatsapp_overlays
+
+    bg = work / "ref_bg.mp4"
+    if not bg.exists():
+        run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i",
+            "gradients=size=1080x1920:rate=30:type=radial,noise=alls=28:allf=t+u:all_seed=1097,"
+            "gblur=sigma=22:steps=2,hue=h='3*t':s=1.4,format=yuv420p",
+            "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-qp", "0",
+            str(bg),
+        ])
+
+    # theme + personas are picked with the global RNG; pin them so every run benches the same frames
+    random.seed(1097)
+    overlays = render_whatsapp_overlays(work / "overlays", [Msg(who=w, text=t, hhmm=f"9:0{i} PM") for i, (w, t) in enumerate(CANNED_MSGS)])
+    step = seconds / (len(CANNED_MSGS) + 1)
+    times = []
+    for i in range(len(CANNED_MSGS)):
+        t = 0.9 + i * step
+        times += [max(0.0, t - 0.9), max(0.0, t - 0.6), max(0.0, t - 0.3), t]
+
+    sr = 22050
+    t = np.arange(seconds * sr) / sr
+    audio = (0.2 * np.sin(2 * np.pi * 180 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    return bg, overlays, times, (audio, sr)
+
+
+def make_long_inputs(work: Path, seconds: int):
+    img = work / "ref_long.jpg"
+    wav = work / "ref_long.wav"
+    if not img.exists():
+        run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc2=size=1920x1080", "-frames:v", "1", str(img)])
+    if not wav.exists():
+        run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", f"anoisesrc=d={seconds}:c=pink:a=0.05", "-ar", "22050", str(wav)])
+    return img, wav
+
+
+# -------- one render per target, settings taken from env via src.encoding --------
+
+def render_target(target: str, inputs, out_mp4: Path, seconds: int):
+    if target == "shorts":
+        import src.shorts_pipeline as sp
+
+        bg, overlays, times, pcm = inputs
+        sp.DURATION = seconds
+        sp.render_final(bg, overlays, times, None, out_mp4, chat_h=860, audio_pcm=pcm)
+    else:
+        import src.long_video as lv
+
+        img, wav = inputs
+        lv.RENDER_MODE = "full"
+        lv.render_long_video(seconds, "Benchmark Reference", [], img, wav, out_mp4)
+
+
+def _set_env(target: str, settings: dict):
+    for k, v in settings.items():
+        os.environ[f"{target.upper()}_X264_{k}"] = str(v)
+
+
+def quality(dist: Path, ref: Path) -> dict:
+    p = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-i", str(dist), "-i", str(ref),
+            "-lavfi", "[0:v]split[a][b];[1:v]split[c][d];[a][c]ssim;[b][d]psnr",
+            "-f", "null", "-",
+        ],
+        capture_output=True, text=True,
+    )
+    ssim = re.search(r"SSIM .*All:([\d.]+)", p.stderr)
+    psnr = re.search(r"PSNR .*average:(inf|[\d.]+)", p.stderr)
+    if psnr is None:
+        psnr_db = None
+    elif psnr.group(1) == "inf":
+        psnr_db = PSNR_IDENTICAL  # json.dumps would write inf as the non-JSON "Infinity"
+    else:
+        psnr_db = float(psnr.group(1))
+    return {
+        "ssim": float(ssim.group(1)) if ssim else None,
+        "psnr": psnr_db,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark x264 settings on fixed shorts / long reference renders.")
+    ap.add_argument("--targets", default="shorts,long")
+    ap.add_argument("--presets", default="ultrafast,veryfast,faster,medium")
+    ap.add_argument("--crfs", default="20,22,24")
+    ap.add_argument("--tunes", default="none", help="comma list, 'none' = no -tune")
+    ap.add_argument("--threads", default="0", help="comma list, 0 = x264 auto")
+    ap.add_argument("--seconds", type=int, default=10)
+    ap.add_argument("--out", type=Path, default=OUT_DIR)
+    args = ap.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    split = lambda s: [x.strip() for x in s.split(",") if x.strip()]
+    matrix = list(itertools.product(split(args.presets), split(args.crfs), split(args.tunes), split(args.threads)))
+
+    rows = []
+    for target in split(args.targets):
+        work = args.out / target
+        work.mkdir(parents=True, exist_ok=True)
+        inputs = make_shorts_inputs(work, args.seconds) if target == "shorts" else make_long_inputs(work, args.seconds)
+
+        # visually lossless reference through the same render path
+        ref = work / "reference.mp4"
+        _set_env(target, {"PRESET": "ultrafast", "CRF": "0", "TUNE": "", "PROFILE": "", "LEVEL": "", "THREADS": ""})
+        try:
+            render_target(target, inputs, ref, args.seconds)
+        except Exception as e:
+            print(f"[WARN] {target} reference render failed, skipping target: {e}", flush=True)
+            continue
+
+        for preset, crf, tune, threads in matrix:
+            name = f"{preset}_crf{crf}_{tune}_t{threads}"
+            out = work / f"{name}.mp4"
+            _set_env(target, {
+                "PRESET": preset,
+                "CRF": crf,
+                "TUNE": "" if tune == "none" else tune,
+                "THREADS": "" if threads == "0" else threads,
+                "PROFILE": "high" if target == "long" else "",
+                "LEVEL": "4.1" if target == "long" else "",
+            })
+            row = {"target": target, "preset": preset, "crf": int(crf), "tune": tune, "threads": int(threads), "args": " ".join(x264_args(target))}
+            t0 = time.perf_counter()
+            try:
+                render_target(target, inputs, out, args.seconds)
+            except Exception as e:
+                print(f"[WARN] {target}/{name} failed: {e}", flush=True)
+                row["error"] = str(e)
+                rows.append(row)
+                continue
+            wall = time.perf_counter() - t0
+            row.update({
+                "wall_sec": round(wall, 2),
+                "fps": round(args.seconds * 30 / wall, 1),
+                "bytes": out.stat().st_size,
+                "kbps": round(out.stat().st_size * 8 / 1000 / args.seconds, 1),
+                **quality(out, ref),
+            })
+            print(f"[BENCH] {row}", flush=True)
+            rows.append(row)
+            out.unlink()
+
+    (args.out / "report.json").write_text(json.dumps(rows, indent=2))
+    fields = ["target", "preset", "crf", "tune", "threads", "wall_sec", "fps", "bytes", "kbps", "ssim", "psnr", "args", "error"]
+    with open(args.out / "report.csv", "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+    print(f"[OK] {len(rows)} runs -> {args.out}/report.json, report.csv", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# checks mutate STATE; the handler reads it to decide what to answer
+STATE: dict = {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, headers=None, body=b""):
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        self.connection.shutdown(socket.SHUT_RDWR)
+        self.close_connection = True
+
+    # -------- Pexels search + clips --------
+
+    def do_GET(self):
+        if self.path.startswith("/search"):
+            STATE["searches"] += 1
+            if STATE["searches"] == 1:
+                return self._reply(503)
+            return self._reply(200, {"Content-Type": "application/json"}, json.dumps({"videos": STATE["videos"]}).encode())
+
+        name = self.path.rsplit("/", 1)[1]
+        clip, delay = STATE["clips"][name], STATE["delays"][name]
+        STATE["started"][name] = time.monotonic()
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(clip)))
+        self.end_headers()
+        sent = 0
+        try:
+            while sent < len(clip):
+                self.wfile.write(clip[sent:sent + 16384])
+                sent += 16384
+                time.sleep(delay)
+        except OSError:
+            STATE["cancelled"][name] = min(sent, len(clip))
+            self.close_connection = True
+
+    # -------- YouTube resumable upload --------
+
+    def do_POST(self):
+        meta = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        STATE["starts"] += 1
+        STATE["size"] = int(self.headers["X-Upload-Content-Length"])
+        STATE["title"] = meta["snippet"]["title"]
+        self._reply(200, {"Location": f"http://127.0.0.1:{self.server.server_address[1]}/session/1"})
+
+    def do_PUT(self):
+        data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        cr = self.headers["Content-Range"]
+        STATE["log"].append(cr)
+        size, have = STATE["size"], len(STATE["received"])
+
+        if cr.startswith("bytes */"):
+            if have == size:
+                return self._reply(200, body=b'{"id": "stub-video"}')
+            return self._reply(308, {"Range": f"bytes=0-{have - 1}"} if have else {})
+
+        STATE["puts"] += 1
+        fault = STATE["faults"].get(STATE["puts"])
+        start = int(re.match(r"bytes (\d+)-", cr)[1])
+        if fault == "drop":
+            # keep half the chunk, then lose the connection mid-request
+            if start == have:
+                STATE["received"] += data[: len(data) // 2]
+            return self._drop()
+        if fault:
+            return self._reply(fault)
+
+        if start == have:
+            STATE["received"] += data
+        have = len(STATE["received"])
+        if have == size:
+            return self._reply(201, body=b'{"id": "stub-video"}')
+        return self._reply(308, {"Range": f"bytes=0-{have - 1}"})
+
+
+def check_upload(work: Path) -> bool:
+    """
+    One process is killed after 4 chunks; a second one must resume the
+    persisted session (no new POST) through a 503 and a dropped connection.
+    """
+    import requests
+
+    import src.youtube_upload as yu
+
+    chunk = 256 * 1024
+    video = work / "video.bin"
+    data = os.urandom(10 * chunk + 777)
+    video.write_bytes(data)
+    state_dir = work / "upload_state"
+    STATE.update(starts=0, puts=0, received=bytearray(), log=[], faults={6: 503, 8: "drop"})
+
+    class Killed(Exception):
+        pass
+
+    class DyingSession(requests.Session):
+        def put(self, url, **kw):
+            if STATE["puts"] >= 4 and not kw["headers"]["Content-Range"].startswith("bytes */"):
+                raise Killed("process killed")
+            return super().put(url, **kw)
+
+    body, params = {"snippet": {"title": "stub"}}, {"part": "snippet,status"}
+    try:
+        yu.ResumableUpload(DyingSession(), str(video), body, params, chunk_size=chunk, state_dir=state_dir).run()
+        print("[FAIL] first upload was expected to die", flush=True)
+        return False
+    except Killed:
+        pass
+    persisted = [p.name for p in state_dir.glob("*.json")]
+
+    # restart: a different chunk size must be ignored in favour of the persisted one
+    up = yu.ResumableUpload(requests.Session(), str(video), body, params, chunk_size=8 << 20, state_dir=state_dir)
+    res = up.run()
+
+    results = {
+        "session state persisted after the kill": len(persisted) == 1,
+        "resumed without a second POST": STATE["starts"] == 1,
+        "resume asked the server for its Range first": STATE["log"][4].startswith("bytes */"),
+        "persisted chunk size reused": up.chunk_size == chunk,
+        "503 and dropped connection retried": STATE["puts"] > 10,
+        "server got the exact file": bytes(STATE["received"]) == data,
+        "video id returned": res.get("id") == "stub-video",
+        "state file removed when done": not any(state_dir.glob("*.json")),
+    }
+    return report("upload", results)
+
+
+def check_pexels(work: Path) -> bool:
+    """
+    Search succeeds after one 503 (retried by the shared session) and is
+    then served from the cache. Of two candidates the first dribbles: once
+    PEXELS_HEDGE_SEC passes a hedged request for the second one starts, wins,
+    and the first is cancelled mid-transfer with its .part removed.
+    """
+    import src.pexels_bg as pb
+    from src.media_probe import probe_duration
+
+    clip_path = work / "clip.mp4"
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=720x1280:rate=30,noise=alls=40:allf=t",
+        "-t", "7", "-c:v", "libx264", "-preset", "ultrafast", "-movflags", "+faststart",
+        str(clip_path),
+    ], check=True)
+    clip = clip_path.read_bytes()
+
+    base = pb.PEXELS_API.rsplit("/", 1)[0]
+    STATE.update(
+        searches=0,
+        videos=[
+            {"id": vid, "video_files": [{"link": f"{base}/clip/{name}", "width": 720, "height": 1280, "file_size": len(clip)}]}
+            for vid, name in ((1, "slow"), (2, "fast"))
+        ],
+        clips={"slow": clip, "fast": clip},
+        delays={"slow": 0.05, "fast": 0.0},
+        started={},
+        cancelled={},
+    )
+
+    videos = pb.search_videos("stub")
+    pb.search_videos("stub")
+    cands = [(v["id"], *pb._best_rendition(v["video_files"])) for v in videos]
+
+    out = work / "bg.mp4"
+    won = pb._race(cands, out, min_bytes=100_000, min_dur=6)
+    slow_part = out.with_name(f"{out.stem}.1.part")
+    deadline = time.monotonic() + 5
+    while (slow_part.exists() or "slow" not in STATE["cancelled"]) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    results = {
+        "search retried after 503, then cached": STATE["searches"] == 2 and len(videos) == 2,
+        "hedge started after PEXELS_HEDGE_SEC": STATE["started"]["fast"] - STATE["started"]["slow"] >= pb.HEDGE_SEC * 0.9,
+        "hedged candidate won": won is not None and won[0] == 2,
+        "winner is a valid clip": out.exists() and probe_duration(out) >= 6,
+        "loser cancelled mid-transfer": STATE["cancelled"].get("slow", len(clip)) < len(clip),
+        "loser .part removed": not slow_part.exists(),
+    }
+    return report("pexels", results)
+
+
+def report(name: str, results: dict) -> bool:
+    for what, ok in results.items():
+        print(f"[{'OK' if ok else 'FAIL'}] {name}: {what}", flush=True)
+    return all(results.values())
+
+
+CHECKS = {"upload": check_upload, "pexels": check_pexels}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Exercise the upload / download retry paths against local stub servers.")
+    ap.add_argument("--only", choices=sorted(CHECKS), help="run a single check")
+    args = ap.parse_args()
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    # read at import time by the modules under test
+    os.environ["YT_UPLOAD_URL"] = f"{base}/upload"
+    os.environ.update(PEXELS_API_URL=f"{base}/search", PEXELS_API_KEY="stub", PEXELS_PARALLEL="1", PEXELS_HEDGE_SEC="0.5")
+
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="stubcheck_") as tmp:
+        os.environ["PEXELS_SEARCH_CACHE"] = str(Path(tmp) / "search_cache")
+        for name, check in CHECKS.items():
+            if args.only in (None, name):
+                work = Path(tmp) / name
+                work.mkdir()
+                ok = check(work) and ok
+    srv.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
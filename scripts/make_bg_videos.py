@@ -2,7 +2,6 @@ import subprocess
 from pathlib import Path
 
 BG_DIR = Path("assets/bg")
-BG_DIR.mkdir(parents=True, exist_ok=True)
 
 W, H, FPS, DUR = 1080, 1920, 30, 45  # 45 sn üret; shortta 35 sn keseriz
 
@@ -39,6 +38,7 @@ def make_one(i: int):
     ])
 
 def main():
+    BG_DIR.mkdir(parents=True, exist_ok=True)
     for i in range(1, 16):
         make_one(i)
     print("[OK] Generated 15 backgrounds in assets/bg/", flush=True)
@@ -0,0 +1,338 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from src.bg_store import BOTTOM_H, CONFORM_VERSION, encode_conformed, file_sha256
+from src.media_probe import probe
+
+LIBRARY_DIR = Path(os.getenv("BG_LIBRARY_DIR", ".cache/bg_library"))
+LOCAL_BG_DIR = Path("assets/bg")
+LIBRARY_LOW = int(os.getenv("BG_LIBRARY_LOW", "3"))        # below this a short fetches synchronously
+LIBRARY_TARGET = int(os.getenv("BG_LIBRARY_TARGET", "8"))  # prefetcher tops up to this many clips
+LIBRARY_MAX = int(os.getenv("BG_LIBRARY_MAX", "40"))       # downloaded clips kept on disk
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id         INTEGER PRIMARY KEY,
+    path       TEXT NOT NULL UNIQUE,
+    source     TEXT NOT NULL,
+    pexels_id  INTEGER UNIQUE,
+    sha256     TEXT NOT NULL UNIQUE,
+    duration   REAL NOT NULL,
+    width      INTEGER,
+    height     INTEGER,
+    bytes      INTEGER NOT NULL,
+    added_at   REAL NOT NULL,
+    last_used  REAL NOT NULL DEFAULT 0,
+    uses       INTEGER NOT NULL DEFAULT 0,
+    origin     TEXT,
+    conformed  TEXT
+);
+"""
+# columns added after the first schema; ALTERed into older index files
+_MIGRATIONS = (("origin", "TEXT"), ("conformed", "TEXT"))
+
+# recipe + size the stored clips are conformed to; a mismatch is re-conformed on pick()
+CONFORM_TAG = f"{CONFORM_VERSION}|{BOTTOM_H}"
+
+
+class BgLibrary:
+    """
+    Persistent background clips + SQLite index (LIBRARY_DIR/index.sqlite):
+    - source ('pexels' | 'local'), Pexels video id, content hash, duration,
+      resolution, last-used time and use count per clip
+    - duplicates are dropped by Pexels id and by sha256 (of the source file)
+    - clips are stored conformed (bg_store.encode_conformed, shorts bottom
+      region), so a short never scales/grades/loop-fades at render time;
+      local assets stay in place and their conformed copy lives in clips/
+    - pick() is least-recently-used (ties broken randomly)
+    Safe to share between the pipeline thread and the prefetcher.
+    """
+
+    def __init__(self, root: Path = LIBRARY_DIR):
+        self.root = root
+        self.clips_dir = root / "clips"
+        self.clips_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(root / "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.executescript(_SCHEMA)
+            have = {r[1] for r in self._db.execute("PRAGMA table_info(clips)")}
+            for col, typ in _MIGRATIONS:
+                if col not in have:
+                    self._db.execute(f"ALTER TABLE clips ADD COLUMN {col} {typ}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -------- queries --------
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+
+    def has_pexels_id(self, pexels_id: int) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM clips WHERE pexels_id = ?", (pexels_id,)).fetchone() is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT source, COUNT(*), COALESCE(SUM(bytes), 0) FROM clips GROUP BY source").fetchall()
+        return {src: {"clips": n, "mb": round(b / 1e6, 1)} for src, n, b in rows}
+
+    # -------- ingest --------
+
+    def add(self, path: Path, source: str, pexels_id: Optional[int] = None, move: bool = True) -> Optional[Path]:
+        """
+        Validate, conform and index a clip. move=True consumes the file
+        (downloads), move=False leaves it in place (assets/bg).
+        Returns the conformed clip, or None if it was a duplicate / invalid
+        (a moved-in duplicate is deleted).
+        """
+        min_dur = int(os.getenv("PEXELS_MIN_DUR", "6"))
+        if pexels_id is not None and self.has_pexels_id(pexels_id):
+            print(f"[BG] Library already has Pexels {pexels_id}, dropping", flush=True)
+            if move:
+                path.unlink(missing_ok=True)
+            return None
+
+        try:
+            info = probe(path)
+        except Exception as e:
+            print(f"[WARN] Library skip {path.name}: probe failed ({e})", flush=True)
+            return None
+        if info.duration < min_dur or not info.width or not info.height:
+            print(f"[WARN] Library skip {path.name}: {info.duration:.1f}s {info.width}x{info.height}", flush=True)
+            if move:
+                path.unlink(missing_ok=True)
+            return None
+
+        digest = file_sha256(path)
+        with self._lock:
+            dup = self._db.execute("SELECT path FROM clips WHERE sha256 = ?", (digest,)).fetchone()
+        if dup is not None:
+            print(f"[BG] Library duplicate of {Path(dup[0]).name}, dropping {path.name}", flush=True)
+            if move:
+                path.unlink(missing_ok=True)
+            return None
+
+        dst = self._conformed_path(digest)
+        try:
+            encode_conformed(path, dst)
+            info = probe(dst)
+        except Exception as e:
+            print(f"[WARN] Library skip {path.name}: conform failed ({e})", flush=True)
+            dst.unlink(missing_ok=True)
+            return None
+        finally:
+            if move:
+                path.unlink(missing_ok=True)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO clips (path, source, pexels_id, sha256, duration, width, height, bytes, added_at, origin, conformed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(dst), source, pexels_id, digest, info.duration, info.width, info.height, dst.stat().st_size,
+                    time.time(), None if move else str(path), CONFORM_TAG,
+                ),
+            )
+        print(f"[BG] Library +{dst.name} ({source}, {info.duration:.1f}s, {info.width}x{info.height})", flush=True)
+        return dst
+
+    def _conformed_path(self, digest: str) -> Path:
+        return self.clips_dir / f"{digest[:20]}_c{CONFORM_VERSION}_{BOTTOM_H}.mp4"
+
+    def ingest_dir(self, d: Path = LOCAL_BG_DIR) -> int:
+        """Index *.mp4 under d in place (paths already indexed are not re-hashed)."""
+        if not d.is_dir():
+            return 0
+        with self._lock:
+            known = {r[0] for r in self._db.execute("SELECT path FROM clips UNION SELECT origin FROM clips")}
+        added = 0
+        for p in sorted(d.glob("*.mp4")):
+            if str(p) not in known and self.add(p, "local", move=False) is not None:
+                added += 1
+        return added
+
+    # -------- selection / upkeep --------
+
+    def pick(self) -> Optional[Path]:
+        """Least-recently-used conformed clip that still exists on disk; marks it used."""
+        while True:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT id, path, source, sha256, origin, conformed FROM clips ORDER BY last_used ASC, RANDOM() LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                p = Path(row["path"])
+                with self._db:
+                    if not p.exists():
+                        self._db.execute("DELETE FROM clips WHERE id = ?", (row["id"],))
+                    elif row["conformed"] == CONFORM_TAG:
+                        self._db.execute(
+                            "UPDATE clips SET last_used = ?, uses = uses + 1 WHERE id = ?", (time.time(), row["id"])
+                        )
+                        return p
+            if p.exists():
+                self._reconform(row)
+            else:
+                print(f"[WARN] Library clip missing, unindexed: {p}", flush=True)
+
+    def _reconform(self, row: sqlite3.Row):
+        """
+        Clip indexed before conform-on-ingest (conformed IS NULL) or with an older
+        recipe: conform it once from its source. Downloads only keep the conformed
+        file, so one with an outdated recipe is dropped (the prefetcher refills).
+        """
+        local = row["source"] == "local"
+        if not local and row["conformed"] is not None:
+            print(f"[BG] Library drop {Path(row['path']).name}: conformed with an older recipe", flush=True)
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM clips WHERE id = ?", (row["id"],))
+            Path(row["path"]).unlink(missing_ok=True)
+            return
+        src = Path(row["origin"]) if local and row["origin"] else Path(row["path"])
+        if not src.exists():
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM clips WHERE id = ?", (row["id"],))
+            return
+        dst = self._conformed_path(row["sha256"])
+        print(f"[BG] Library re-conforming {src.name}", flush=True)
+        try:
+            encode_conformed(src, dst)
+            info = probe(dst)
+        except Exception as e:
+            print(f"[WARN] Library drop {src.name}: conform failed ({e})", flush=True)
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM clips WHERE id = ?", (row["id"],))
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE clips SET path = ?, origin = ?, conformed = ?, duration = ?, width = ?, height = ?, bytes = ? WHERE id = ?",
+                (
+                    str(dst), str(src) if local else None, CONFORM_TAG,
+                    info.duration, info.width, info.height, dst.stat().st_size, row["id"],
+                ),
+            )
+        if not local and src != dst:
+            src.unlink(missing_ok=True)
+
+    def prune(self, max_clips: int = LIBRARY_MAX, keep: Optional[Path] = None) -> int:
+        """
+        Keep at most max_clips downloaded clips; retires the most-used ones
+        first (they have been seen the most). Local assets and `keep` are never deleted.
+        """
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT id, path FROM clips WHERE source != 'local' AND path != ? ORDER BY uses DESC, last_used DESC",
+                (str(keep),),
+            ).fetchall()
+            extra = rows[:max(0, len(rows) - max_clips)]
+            for r in extra:
+                self._db.execute("DELETE FROM clips WHERE id = ?", (r["id"],))
+        for r in extra:
+            Path(r["path"]).unlink(missing_ok=True)
+        return len(extra)
+
+
+def fetch_into_library(lib: BgLibrary) -> Optional[Path]:
+    """Download one new Pexels clip (skipping ids already indexed) and add it."""
+    from src.pexels_bg import fetch_pexels_clip
+
+    tmp = lib.clips_dir / f"incoming_{os.getpid()}_{threading.get_ident()}.mp4"
+    try:
+        vid = fetch_pexels_clip(tmp, skip_id=lib.has_pexels_id)
+        if vid is None:
+            return None
+        return lib.add(tmp, "pexels", pexels_id=vid)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class Prefetcher:
+    """
+    Background thread that tops the library up to `target` clips while the
+    pipeline renders. Errors are logged, never raised into the pipeline.
+    """
+
+    def __init__(self, lib: BgLibrary, target: int = LIBRARY_TARGET):
+        self.lib = lib
+        self.target = target
+        self._stop = threading.Event()
+        self._t = threading.Thread(target=self._run, name="bg-prefetch", daemon=True)
+
+    def start(self) -> "Prefetcher":
+        self._t.start()
+        return self
+
+    def _run(self):
+        misses = 0
+        while not self._stop.is_set() and self.lib.count() < self.target and misses < 3:
+            try:
+                if fetch_into_library(self.lib) is None:
+                    misses += 1
+            except Exception as e:
+                print(f"[WARN] BG prefetch failed: {e}", flush=True)
+                misses += 1
+
+    def wait(self, timeout: Optional[float] = None):
+        self._t.join(timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Lets the current download finish (up to timeout), then stops."""
+        self._stop.set()
+        self.wait(timeout)
+
+
+def acquire_bg(lib: Optional[BgLibrary] = None, prefetch: bool = True):
+    """
+    Pipeline entry point. Returns (conformed_clip_path, prefetcher_or_None):
+    - assets/bg clips are conformed + indexed on first sight
+    - only when fewer than LIBRARY_LOW clips exist is Pexels hit synchronously
+    - otherwise the LRU clip is used right away and, if below LIBRARY_TARGET,
+      a Prefetcher tops the library up in the background
+    """
+    lib = lib or BgLibrary()
+    lib.ingest_dir()
+
+    if lib.count() < LIBRARY_LOW:
+        print(f"[BG] Library low ({lib.count()} < {LIBRARY_LOW}), fetching now", flush=True)
+        fetch_into_library(lib)
+
+    clip = lib.pick()
+    if clip is None:
+        raise RuntimeError("Background library is empty and Pexels returned nothing")
+    print(f"[BG] Using library clip {clip.name} {lib.stats()}", flush=True)
+
+    pf = None
+    if prefetch and lib.count() < LIBRARY_TARGET and os.getenv("PEXELS_API_KEY"):
+        pf = Prefetcher(lib).start()
+    lib.prune(keep=clip)
+    return clip, pf
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Background library maintenance.")
+    ap.add_argument("--ingest", type=Path, default=LOCAL_BG_DIR, help="index local clips in place")
+    ap.add_argument("--fill", action="store_true", help="download from Pexels up to BG_LIBRARY_TARGET")
+    args = ap.parse_args()
+
+    lib = BgLibrary()
+    print(f"[BG] Indexed {lib.ingest_dir(args.ingest)} local clips", flush=True)
+    if args.fill:
+        pf = Prefetcher(lib).start()
+        pf.wait()
+    lib.prune()
+    print("[BG] Library:", lib.stats(), flush=True)
+
+
+if __name__ == "__main__":
+    main()
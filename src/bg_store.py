@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from src.media_probe import probe
+
+BG_CACHE_DIR = Path(os.getenv("SHORTS_BG_CACHE", ".cache/bg"))
+BG_CACHE_MAX = int(os.getenv("SHORTS_BG_CACHE_MAX", "40"))  # conformed clips kept (LRU by mtime)
+
+W = 1080
+FPS = 30
+BOTTOM_H = 1920 - 860  # shorts background region below the chat (chat_h=860)
+GRADE = "eq=contrast=1.05:saturation=1.10"
+LOOP_XFADE_SEC = 1.0
+# bump when the conform recipe changes so old cache entries are not reused
+CONFORM_VERSION = "1"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def conform_key(src: Path, bottom_h: int, fps: int = FPS) -> str:
+    params = f"{CONFORM_VERSION}|{W}x{bottom_h}|{fps}|yuv420p|{GRADE}|{LOOP_XFADE_SEC}"
+    return hashlib.sha256(f"{file_sha256(src)}|{params}".encode("utf-8")).hexdigest()[:32]
+
+
+def _conform_filter(bottom_h: int, fps: int, dur: float) -> str:
+    """
+    scale/crop/grade/fps once, then make the clip loop seamlessly:
+    the first xf seconds are crossfaded onto the tail, and the output starts
+    at xf, so out[-1] -> out[0] continues exactly where the fade ended.
+    """
+    base = (
+        f"[0:v]scale={W}:{bottom_h}:force_original_aspect_ratio=increase,"
+        f"crop={W}:{bottom_h},"
+        f"{GRADE},"
+        f"fps={fps},format=yuv420p,setsar=1"
+    )
+    xf = min(LOOP_XFADE_SEC, dur / 4.0)
+    if xf < 2.0 / fps:
+        return base + "[v]"
+    return ";".join([
+        base + ",split[a][b]",
+        f"[a]trim=start={xf:.3f},setpts=PTS-STARTPTS,fps={fps}[body]",
+        f"[b]trim=end={xf:.3f},setpts=PTS-STARTPTS,fps={fps}[head]",
+        f"[body][head]xfade=transition=fade:duration={xf:.3f}:offset={dur - 2 * xf:.3f}[v]",
+    ])
+
+
+def _prune(cache_dir: Path, keep: Path):
+    clips = sorted(cache_dir.glob("*.mp4"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in clips[BG_CACHE_MAX:]:
+        if p == keep:
+            continue
+        p.unlink(missing_ok=True)
+        p.with_suffix(".json").unlink(missing_ok=True)
+
+
+def encode_conformed(src: Path, out: Path, bottom_h: int = BOTTOM_H, fps: int = FPS) -> None:
+    """One conform encode (scale/crop/grade/fps, loop seam, closed GOPs) of src into out, atomically."""
+    dur = probe(src).duration
+    tmp = out.with_suffix(f".{os.getpid()}.tmp.mp4")
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", str(src),
+        "-filter_complex", _conform_filter(bottom_h, fps, dur),
+        "-map", "[v]", "-an",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+        "-pix_fmt", "yuv420p",
+        "-g", str(fps), "-keyint_min", str(fps), "-sc_threshold", "0", "-flags", "+cgop",
+        "-movflags", "+faststart",
+        str(tmp),
+    ]
+    print(" ".join(cmd), flush=True)
+    try:
+        subprocess.run(cmd, check=True)
+        os.replace(tmp, out)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def conform_bg(src: Path, bottom_h: int, fps: int = FPS, cache_dir: Optional[Path] = None) -> Path:
+    """
+    Returns a clip that is already exactly W x bottom_h, fps, yuv420p and
+    graded, so renderers only pad/overlay it:
+    - seamless loop point (head crossfaded into the tail)
+    - closed 1 s GOPs, no scene-cut keyframes: -stream_loop restarts on a keyframe
+    - cached under SHORTS_BG_CACHE keyed by source content + conform params
+    """
+    cache_dir = cache_dir or BG_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = conform_key(src, bottom_h, fps)
+    out = cache_dir / f"{key}.mp4"
+    if out.exists():
+        os.utime(out)
+        print(f"[BG] Conformed clip cache hit: {out.name}", flush=True)
+        return out
+
+    encode_conformed(src, out, bottom_h, fps)
+
+    info = probe(out)
+    out.with_suffix(".json").write_text(json.dumps({
+        "source": str(src),
+        "width": info.width,
+        "height": info.height,
+        "fps": fps,
+        "duration": info.duration,
+        "version": CONFORM_VERSION,
+    }))
+    print(f"[BG] Conformed {src.name} -> {out.name} ({info.width}x{info.height}, {info.duration:.1f}s)", flush=True)
+    _prune(cache_dir, out)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Conform background clips for the shorts bottom region.")
+    ap.add_argument("clips", nargs="+", type=Path)
+    ap.add_argument("--chat-h", type=int, default=860)
+    args = ap.parse_args()
+
+    outs: List[Path] = [conform_bg(p, 1920 - args.chat_h) for p in args.clips]
+    print(f"[OK] {len(outs)} clips conformed into {BG_CACHE_DIR}/", flush=True)
+
+
+if __name__ == "__main__":
+    main()
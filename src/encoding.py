@@ -0,0 +1,33 @@
+import os
+from typing import List
+
+# defaults = what each renderer hard-coded before this was configurable ("" = x264 default)
+_DEFAULTS = {
+    "SHORTS": {"PRESET": "veryfast", "CRF": "22", "TUNE": "", "PROFILE": "", "LEVEL": "", "THREADS": ""},
+    "LONG": {"PRESET": "", "CRF": "", "TUNE": "", "PROFILE": "high", "LEVEL": "4.1", "THREADS": ""},
+}
+
+_FLAGS = (
+    ("PRESET", "-preset"),
+    ("CRF", "-crf"),
+    ("TUNE", "-tune"),
+    ("PROFILE", "-profile:v"),
+    ("LEVEL", "-level"),
+    ("THREADS", "-threads"),
+)
+
+
+def x264_args(kind: str) -> List[str]:
+    """
+    libx264 output args for a render kind ("shorts" | "long").
+    Every setting can be overridden with {KIND}_X264_{PRESET,CRF,TUNE,PROFILE,LEVEL,THREADS};
+    an empty value leaves it to x264. Read on each call so scripts/bench_encode.py
+    can switch profiles in-process.
+    """
+    k = kind.upper()
+    args = ["-c:v", "libx264"]
+    for opt, flag in _FLAGS:
+        v = os.getenv(f"{k}_X264_{opt}", _DEFAULTS[k][opt]).strip()
+        if v:
+            args += [flag, v]
+    return args + ["-pix_fmt", "yuv420p"]
@@ -0,0 +1,12 @@
+import os
+import shutil
+from pathlib import Path
+
+
+def link_or_copy(src: Path, dst: Path):
+    """Hard link when src and dst share a filesystem, else a kernel-side copy (sendfile)."""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
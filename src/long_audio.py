@@ -1,80 +1,199 @@
+import os
+import queue
 import subprocess
+import threading
+import wave
 from pathlib import Path
+from typing import Optional
 
-def run(cmd):
-    print("\n[CMD]", " ".join(cmd), flush=True)
-    p = subprocess.run(cmd, text=True, capture_output=True)
-    if p.stdout:
-        print("[STDOUT]\n", p.stdout[-4000:], flush=True)
-    if p.stderr:
-        print("[STDERR]\n", p.stderr[-4000:], flush=True)
-    if p.returncode != 0:
-        raise RuntimeError(f"Command failed with exit code {p.returncode}")
-
-def normalize_wav(in_wav: Path, out_wav: Path):
+import numpy as np
+
+SAMPLE_RATE = 22050
+BLOCK = 1 << 16  # samples per block (~3s), keeps memory flat for any length
+
+AMBIENT_DIR = Path(os.getenv("LONG_AMBIENT_CACHE", ".cache/ambient"))
+AMBIENT_LOOP_SEC = 30
+AMBIENT_LOWPASS_HZ = 1800
+# Same levels the old ffmpeg graph produced: anoisesrc(0.03) -> lowpass -> volume 0.10,
+# then amix=inputs=2 halves both voice and ambient.
+AMBIENT_RMS = float(os.getenv("LONG_AMBIENT_RMS", "0.0005"))
+VOICE_GAIN = float(os.getenv("LONG_VOICE_GAIN", "0.5"))
+
+
+def ambient_bed(sr: int = SAMPLE_RATE, seconds: int = AMBIENT_LOOP_SEC, seed: int = 7) -> np.ndarray:
     """
-    Tüm chapter wav'larını aynı formata getir:
-    - PCM 16-bit
-    - 22050 Hz
-    - mono
+    Low-passed pink noise that loops seamlessly.
+    Built in the frequency domain (1/sqrt(f) amplitude, nothing above
+    AMBIENT_LOWPASS_HZ), so the inverse FFT is periodic by construction:
+    bed[-1] -> bed[0] is as smooth as any other sample pair.
+    Cached as .npy; generated once per (sr, seconds, seed).
     """
-    run([
-        "ffmpeg","-y",
-        "-i", str(in_wav),
-        "-ac","1",
-        "-ar","22050",
-        "-c:a","pcm_s16le",
-        str(out_wav)
-    ])
-
-def concat_wavs_filter(normalized_wavs, out_voice_wav: Path):
+    p = AMBIENT_DIR / f"pink_{sr}_{seconds}_{seed}_{AMBIENT_LOWPASS_HZ}_{AMBIENT_RMS}.npy"
+    try:
+        return np.load(p, allow_pickle=False)
+    except (FileNotFoundError, ValueError, OSError):
+        pass
+
+    n = sr * seconds
+    rng = np.random.default_rng(seed)
+    freqs = np.fft.rfftfreq(n, d=1.0 / sr)
+    spec = rng.standard_normal(len(freqs)) + 1j * rng.standard_normal(len(freqs))
+    amp = np.zeros_like(freqs)
+    band = (freqs > 0) & (freqs <= AMBIENT_LOWPASS_HZ)
+    amp[band] = 1.0 / np.sqrt(freqs[band])
+    bed = np.fft.irfft(spec * amp, n=n)
+    bed *= AMBIENT_RMS / (np.sqrt(np.mean(bed ** 2)) + 1e-12)
+    bed = bed.astype(np.float32)
+
+    try:
+        AMBIENT_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, bed, allow_pickle=False)
+        os.replace(tmp, p)
+    except OSError as e:
+        print(f"[WARN] Ambient bed cache write failed: {e}", flush=True)
+    return bed
+
+
+class LongAudioWriter:
     """
-    WAV concat için en stabil yöntem: concat filter (re-encode)
+    Streaming long-audio engine, one pass, bounded memory:
+    - add_chapter(wav): ffmpeg decodes + resamples to mono 22050 s16le on a pipe,
+      read in BLOCK-sized pieces
+    - pause_sec of real silence between chapters
+    - looping ambient bed mixed in block by block (pauses included)
+    - written straight into out_final_wav (optionally also a voice-only WAV)
     """
-    # ffmpeg input list: -i a.wav -i b.wav ...
-    cmd = ["ffmpeg","-y"]
-    for w in normalized_wavs:
-        cmd += ["-i", str(w)]
-
-    # concat filter: n = input sayısı
-    n = len(normalized_wavs)
-    cmd += [
-        "-filter_complex", f"concat=n={n}:v=0:a=1[aout]",
-        "-map", "[aout]",
-        "-c:a","pcm_s16le",
-        str(out_voice_wav)
-    ]
-    run(cmd)
-
-def build_long_audio_with_ambient(chapter_wavs, out_voice_wav: Path, out_final_wav: Path, pause_sec: int = 4):
+
+    def __init__(self, out_final_wav: Path, out_voice_wav: Optional[Path] = None, pause_sec: float = 4, sr: int = SAMPLE_RATE):
+        self.sr = sr
+        self.pause_frames = int(round(pause_sec * sr))
+        self.frames = 0
+        self.chapters = 0
+        self._bed = ambient_bed(sr)
+        self._final = self._open(out_final_wav)
+        self._voice = self._open(out_voice_wav) if out_voice_wav else None
+        self.out_final_wav = out_final_wav
+
+    def _open(self, path: Path) -> wave.Wave_write:
+        wf = wave.open(str(path), "wb")
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(self.sr)
+        return wf
+
+    def _ambient(self, n: int) -> np.ndarray:
+        start = self.frames % len(self._bed)
+        idx = (np.arange(n) + start) % len(self._bed)
+        return self._bed[idx]
+
+    def _write(self, voice: np.ndarray):
+        """voice: int16 block"""
+        if self._voice is not None:
+            self._voice.writeframesraw(voice.tobytes())
+        mix = voice.astype(np.float32) * (VOICE_GAIN / 32768.0) + self._ambient(len(voice))
+        out = np.clip(np.round(mix * 32767.0), -32768, 32767).astype("<i2")
+        self._final.writeframesraw(out.tobytes())
+        self.frames += len(voice)
+
+    def add_silence(self, frames: int):
+        while frames > 0:
+            n = min(frames, BLOCK)
+            self._write(np.zeros(n, dtype=np.int16))
+            frames -= n
+
+    def add_chapter(self, chapter_wav: Path) -> float:
+        """
+        Appends one chapter (preceded by the pause if it isn't the first).
+        Returns the chapter's voice length in seconds.
+        """
+        if self.chapters:
+            self.add_silence(self.pause_frames)
+
+        p = subprocess.Popen(
+            [
+                "ffmpeg","-v","error",
+                "-i", str(chapter_wav),
+                "-ac","1",
+                "-ar", str(self.sr),
+                "-f","s16le","-",
+            ],
+            stdout=subprocess.PIPE,
+        )
+        start = self.frames
+        carry = b""
+        for chunk in iter(lambda: p.stdout.read(BLOCK * 2), b""):
+            chunk = carry + chunk
+            usable = len(chunk) - (len(chunk) % 2)
+            carry = chunk[usable:]
+            if usable:
+                self._write(np.frombuffer(chunk[:usable], dtype="<i2"))
+        if p.wait() != 0:
+            raise RuntimeError(f"Decode failed for {chapter_wav} (exit {p.returncode})")
+
+        self.chapters += 1
+        return (self.frames - start) / float(self.sr)
+
+    def close(self) -> Path:
+        if self._voice is not None:
+            self._voice.close()
+        self._final.close()
+        return self.out_final_wav
+
+
+def build_long_audio_with_ambient(chapter_wavs, out_voice_wav: Optional[Path], out_final_wav: Path, pause_sec: int = 4):
     """
-    1) Chapter wav -> normalize (mono, 22050, pcm_s16le)
-    2) concat filter ile birleştir
-    3) aralara “pause” eklemek için voice'a apad + atrim değil:
-       basitçe ambient mix ile yumuşatıyoruz (stabil)
-    4) pink noise ambient düşük vol ile mix
+    Chapter wav'ları tek geçişte birleştir:
+    1) her chapter ffmpeg pipe ile mono/22050/s16le (blok blok)
+    2) chapter aralarına gerçek pause_sec sessizlik
+    3) önceden üretilmiş, kesintisiz dönen pink-noise ambient mix
+    out_voice_wav=None -> sadece final WAV yazılır (ara dosya yok)
     """
-    tmp_dir = out_voice_wav.parent / "tmp_norm"
-    tmp_dir.mkdir(exist_ok=True)
-
-    normalized = []
-    for i, w in enumerate(chapter_wavs, start=1):
-        nw = tmp_dir / f"norm_{i:02d}.wav"
-        normalize_wav(w, nw)
-        normalized.append(nw)
-
-    concat_wavs_filter(normalized, out_voice_wav)
-
-    # Ambient mix (çok kısık)
-    run([
-        "ffmpeg","-y",
-        "-i", str(out_voice_wav),
-        "-f","lavfi","-i","anoisesrc=color=pink:amplitude=0.03",
-        "-filter_complex",
-        "[1:a]lowpass=f=1800,volume=0.10[aamb];"
-        "[0:a]volume=1.0[avoice];"
-        "[avoice][aamb]amix=inputs=2:duration=first:dropout_transition=2[amix]",
-        "-map","[amix]",
-        "-c:a","pcm_s16le",
-        str(out_final_wav)
-    ])
+    w = LongAudioWriter(out_final_wav, out_voice_wav, pause_sec=pause_sec)
+    for cw in chapter_wavs:
+        w.add_chapter(cw)
+    return w.close()
+
+
+class VoiceTrackWriter:
+    """
+    Streaming consumer for the long pipeline:
+    - add(chapter_wav) returns immediately
+    - a background thread feeds each chapter into a LongAudioWriter, in add() order,
+      while the producer synthesises the next one
+    - close() waits for the queue to drain and finalises the WAV headers
+    """
+
+    def __init__(self, out_final_wav: Path, out_voice_wav: Optional[Path] = None, pause_sec: float = 4):
+        self.writer = LongAudioWriter(out_final_wav, out_voice_wav, pause_sec=pause_sec)
+        self._q: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._t = threading.Thread(target=self._worker, name="voice-track", daemon=True)
+        self._t.start()
+
+    def add(self, chapter_wav: Path):
+        if self._error is not None:
+            raise RuntimeError("voice track writer failed") from self._error
+        self._q.put(chapter_wav)
+
+    def _worker(self):
+        while True:
+            w = self._q.get()
+            if w is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self.writer.add_chapter(w)
+                print(f"[AUDIO] Track +{w.name} ({self.writer.frames / self.writer.sr:.1f}s)", flush=True)
+            except BaseException as e:
+                self._error = e
+
+    def close(self) -> Path:
+        self._q.put(None)
+        self._t.join()
+        out = self.writer.close()
+        if self._error is not None:
+            raise RuntimeError("voice track writer failed") from self._error
+        return out
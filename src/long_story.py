@@ -1,4 +1,5 @@
 import random
+from typing import List
 
 THEMES = [
     "The Quiet Floating City of Light",
@@ -45,12 +46,14 @@ SENTENCE_BANK = {
     ]
 }
 
-def _make_paragraph(rng: random.Random, n_sent: int) -> str:
+CHAPTER_BREATH = "Take a slow breath in… and out."
+
+def _make_sentences(rng: random.Random, n_sent: int) -> List[str]:
     parts = []
     for _ in range(n_sent):
         bucket = rng.choice(["world","journey","calm","sleep"])
         parts.append(rng.choice(SENTENCE_BANK[bucket]))
-    return " ".join(parts)
+    return parts
 
 def generate_long_story(target_minutes: int = 60) -> dict:
     rng = random.Random()
@@ -76,14 +79,14 @@ def generate_long_story(target_minutes: int = 60) -> dict:
         if i == num_chapters:
             n += 15  # closure daha uzun
 
-        text = _make_paragraph(rng, n)
+        body = _make_sentences(rng, n)
 
         # Chapter başı yumuşak giriş
-        intro = (
-            f"Chapter {i}. {name}. "
-            "Take a slow breath in… and out. "
-        )
-        chapters.append({"name": name, "text": intro + text})
+        intro = [f"Chapter {i}. {name}.", CHAPTER_BREATH]
+
+        # sentences: phrase-library mode synthesises each distinct one once
+        sentences = intro + body
+        chapters.append({"name": name, "text": " ".join(sentences), "sentences": sentences})
 
     hashtags = ["#SleepStory", "#ImmersiveWorlds", "#DeepSleep", "#Relaxation"]
     tags = ["sleep story","immersive","relaxation","deep sleep","calm","bedtime story","ambient"]
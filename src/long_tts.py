@@ -0,0 +1,75 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from src.media_probe import probe_duration
+from src.shorts_audio import tts_to_wav
+from src.tts_models import DEFAULT_MODEL, get_tts
+
+# (text, wav_path, speaker)
+ChapterJob = Tuple[str, Path, str]
+
+
+def _init_worker(model_name: str, torch_threads: int):
+    """
+    Runs once per worker: split the CPU between workers and load the model
+    so every chapter this worker gets reuses it.
+    """
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except Exception:
+        pass
+    get_tts(model_name)
+
+
+def tts_pool(workers: int, model_name: str = DEFAULT_MODEL) -> ProcessPoolExecutor:
+    """
+    LONG_TTS_WORKERS process pool: the CPU is split between workers and each
+    loads the model once. Jobs should synthesise locally (not via the daemon).
+    """
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[TTS] Synthesis pool: {workers} workers x {torch_threads} threads", flush=True)
+
+    # spawn: never fork a process that may already hold torch/OpenMP state
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, torch_threads),
+    )
+
+
+def synth_chapter(job: ChapterJob, model_name: str = DEFAULT_MODEL, use_daemon: bool = True) -> Tuple[Path, float]:
+    text, wav_path, speaker = job
+    tts_to_wav(text, wav_path, speaker, model_name=model_name, use_daemon=use_daemon)
+    return wav_path, probe_duration(wav_path)
+
+
+def iter_chapters(jobs: List[ChapterJob], workers: int = 1) -> Iterator[Tuple[Path, float]]:
+    """
+    Synthesise chapter WAVs, yields (wav_path, exact_seconds) in job order
+    as soon as each chapter (and every chapter before it) is ready.
+    - workers <= 1: in-process, one after another
+    - workers > 1: process pool, each worker loads the model once and
+      synthesises locally (the daemon has a single synthesis thread and
+      would serialise the pool); results are yielded in submission order
+    """
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        for j in jobs:
+            yield synth_chapter(j)
+        return
+
+    with tts_pool(workers) as ex:
+        yield from ex.map(partial(synth_chapter, use_daemon=False), jobs)
+
+
+def synthesize_chapters(jobs: List[ChapterJob], workers: int = 1) -> List[Tuple[Path, float]]:
+    """
+    Same as iter_chapters, but waits for every chapter.
+    """
+    return list(iter_chapters(jobs, workers))
@@ -1,5 +1,12 @@
+import math
+import os
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Tuple
+
+from src.encoding import x264_args
 
 def run(cmd):
     print("\n[CMD]", " ".join(map(str, cmd)), flush=True)
@@ -20,6 +27,35 @@ def _escape_drawtext(s: str) -> str:
          .replace('"', "")
     )
 
+# full: one ffmpeg over the whole timeline | loop: one short segment repeated with stream copy
+# parallel: timeline split into GOP-aligned segments rendered by concurrent ffmpeg workers
+RENDER_MODE = os.getenv("LONG_RENDER_MODE", "full").strip().lower()
+LOOP_SEGMENT_SEC = int(os.getenv("LONG_LOOP_SEGMENT_SEC", "10"))
+RENDER_WORKERS = int(os.getenv("LONG_RENDER_WORKERS", "0")) or (os.cpu_count() or 1)
+
+FPS = 30
+GOP = 2 * FPS
+
+
+def _video_filter(title: str) -> str:
+    """Ken Burns + grade + title overlay; shared by every render mode."""
+    safe_title = _escape_drawtext(title)
+    return (
+        "scale=1280:720:force_original_aspect_ratio=increase,"
+        "crop=1280:720,"
+        "setsar=1,"
+        # slow zoom/pan
+        "zoompan=z='min(zoom+0.00008,1.12)':"
+        "x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':"
+        f"d=1:s=1280x720:fps={FPS},"
+        "gblur=sigma=2,"
+        "format=yuv420p,"
+        "drawbox=x=0:y=0:w=iw:h=ih:color=black@0.22:t=fill,"
+        "drawtext=text='IMMERSIVE WORLDS':fontcolor=white@0.70:fontsize=34:x=(w-text_w)/2:y=70,"
+        f"drawtext=text='{safe_title}':fontcolor=white@0.90:fontsize=44:x=(w-text_w)/2:y=130"
+    )
+
+
 def render_long_video(
     total_seconds: int,
     title: str,
@@ -34,37 +70,170 @@ def render_long_video(
     - soft dark overlay
     - small title text
     - audio muxed in same command (final mp4 ready)
+    LONG_RENDER_MODE=loop / parallel render the same picture via
+    render_long_video_loop / render_long_video_parallel.
     """
-    safe_title = _escape_drawtext(title)
-
-    vf = (
-        "scale=1280:720:force_original_aspect_ratio=increase,"
-        "crop=1280:720,"
-        "setsar=1,"
-        # slow zoom/pan
-        "zoompan=z='min(zoom+0.00008,1.12)':"
-        "x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':"
-        "d=1:s=1280x720:fps=30,"
-        "gblur=sigma=2,"
-        "format=yuv420p,"
-        "drawbox=x=0:y=0:w=iw:h=ih:color=black@0.22:t=fill,"
-        "drawtext=text='IMMERSIVE WORLDS':fontcolor=white@0.70:fontsize=34:x=(w-text_w)/2:y=70,"
-        f"drawtext=text='{safe_title}':fontcolor=white@0.90:fontsize=44:x=(w-text_w)/2:y=130"
-    )
+    if RENDER_MODE == "loop" and total_seconds > 2 * LOOP_SEGMENT_SEC:
+        return render_long_video_loop(total_seconds, title, chapters, bg_img, audio_wav, out_mp4)
+    if RENDER_MODE == "parallel" and RENDER_WORKERS > 1:
+        return render_long_video_parallel(total_seconds, title, chapters, bg_img, audio_wav, out_mp4, workers=RENDER_WORKERS)
 
     run([
         "ffmpeg","-y",
         "-loop","1","-i", str(bg_img),
         "-i", str(audio_wav),
         "-t", str(total_seconds),
-        "-vf", vf,
-        "-r","30",
-        "-c:v","libx264",
-        "-profile:v","high",
-        "-level","4.1",
-        "-pix_fmt","yuv420p",
+        "-vf", _video_filter(title),
+        "-r", str(FPS),
+        *x264_args("long"),
         "-movflags","+faststart",
         "-c:a","aac","-b:a","192k",
         "-shortest",
         str(out_mp4)
     ])
+
+
+def render_long_video_loop(
+    total_seconds: int,
+    title: str,
+    chapters,
+    bg_img: Path,
+    audio_wav: Path,
+    out_mp4: Path
+):
+    """
+    Same picture as render_long_video without filtering/encoding every frame.
+    zoompan with d=1 on a looped still starts from zoom=1 on each input
+    frame, so that chain yields the same frame for the whole video:
+    - LOOP_SEGMENT_SEC of it is rendered once (closed GOPs)
+    - the segment is repeated through the concat demuxer with stream copy
+    - audio is the only thing encoded over the full length
+    """
+    seg_dir = out_mp4.parent / "long_segments"
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    seg = seg_dir / "loop.mp4"
+
+    t0 = time.perf_counter()
+    run([
+        "ffmpeg","-y",
+        "-loop","1","-i", str(bg_img),
+        "-vf", _video_filter(title),
+        "-frames:v", str(LOOP_SEGMENT_SEC * FPS),
+        "-r", str(FPS),
+        *x264_args("long"),
+        "-g", str(LOOP_SEGMENT_SEC * FPS), "-flags", "+cgop",
+        "-an",
+        str(seg)
+    ])
+    t1 = time.perf_counter()
+
+    repeats = math.ceil(total_seconds / LOOP_SEGMENT_SEC)
+    lst = seg_dir / "loop.ffconcat"
+    lst.write_text("ffconcat version 1.0\n" + f"file '{seg.resolve()}'\n" * repeats)
+
+    run([
+        "ffmpeg","-y",
+        "-f","concat","-safe","0","-i", str(lst),
+        "-i", str(audio_wav),
+        "-map","0:v","-map","1:a",
+        "-t", str(total_seconds),
+        "-c:v","copy",
+        "-c:a","aac","-b:a","192k",
+        "-movflags","+faststart",
+        str(out_mp4)
+    ])
+    print(
+        f"[OK] Loop render: segment {t1 - t0:.1f}s, mux {time.perf_counter() - t1:.1f}s "
+        f"({repeats} x {LOOP_SEGMENT_SEC}s)",
+        flush=True,
+    )
+
+
+def _segment_plan(total_frames: int, workers: int) -> List[Tuple[int, int]]:
+    """[(start_frame, frames)] covering total_frames; every segment but the last is a whole number of GOPs."""
+    per = max(GOP, math.ceil(total_frames / workers / GOP) * GOP)
+    return [(start, min(per, total_frames - start)) for start in range(0, total_frames, per)]
+
+
+def render_long_video_parallel(
+    total_seconds: int,
+    title: str,
+    chapters,
+    bg_img: Path,
+    audio_wav: Path,
+    out_mp4: Path,
+    workers: int = RENDER_WORKERS,
+):
+    """
+    Same picture as render_long_video, encoded by `workers` ffmpeg processes:
+    - the timeline is split at GOP boundaries (fixed GOP, closed, no scene-cut
+      keyframes), so every segment starts with an IDR frame
+    - the filter chain keeps no state from one frame to the next (zoompan
+      restarts per input frame), so a segment only needs its frame count
+      and joins without a visible seam
+    - audio is encoded once to AAC alongside the video workers
+    - segments + audio are joined with the concat demuxer and stream copy
+    """
+    seg_dir = out_mp4.parent / "long_segments"
+    seg_dir.mkdir(parents=True, exist_ok=True)
+
+    plan = _segment_plan(total_seconds * FPS, workers)
+    enc = x264_args("long")
+    # split the cores between segments unless LONG_X264_THREADS pins it
+    threads = max(1, (os.cpu_count() or 1) // len(plan))
+    if "-threads" in enc:
+        threads = enc[enc.index("-threads") + 1]
+    else:
+        enc += ["-threads", str(threads)]
+    segs = [seg_dir / f"seg_{i:03d}.mp4" for i in range(len(plan))]
+    audio_m4a = seg_dir / "audio.m4a"
+
+    def render_segment(i: int):
+        start, frames = plan[i]
+        run([
+            "ffmpeg","-y",
+            "-loop","1","-i", str(bg_img),
+            "-vf", _video_filter(title),
+            "-frames:v", str(frames),
+            "-r", str(FPS),
+            *enc,
+            "-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0", "-flags", "+cgop",
+            "-an",
+            str(segs[i])
+        ])
+
+    def encode_audio():
+        run([
+            "ffmpeg","-y",
+            "-i", str(audio_wav),
+            "-t", str(total_seconds),
+            "-vn","-c:a","aac","-b:a","192k",
+            str(audio_m4a)
+        ])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(plan) + 1) as ex:
+        futs = [ex.submit(render_segment, i) for i in range(len(plan))]
+        futs.append(ex.submit(encode_audio))
+        for f in futs:
+            f.result()
+    t1 = time.perf_counter()
+
+    lst = seg_dir / "segments.ffconcat"
+    lst.write_text("ffconcat version 1.0\n" + "".join(f"file '{p.resolve()}'\n" for p in segs))
+
+    run([
+        "ffmpeg","-y",
+        "-f","concat","-safe","0","-i", str(lst),
+        "-i", str(audio_m4a),
+        "-map","0:v","-map","1:a",
+        "-t", str(total_seconds),
+        "-c","copy",
+        "-movflags","+faststart",
+        str(out_mp4)
+    ])
+    print(
+        f"[OK] Parallel render: {len(plan)} segments x {threads} threads in {t1 - t0:.1f}s, "
+        f"mux {time.perf_counter() - t1:.1f}s",
+        flush=True,
+    )
@@ -0,0 +1,321 @@
+import json
+import os
+import struct
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    duration: float
+    container: str
+    codec: Optional[str] = None        # first video codec, else first audio codec
+    width: Optional[int] = None
+    height: Optional[int] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+class ProbeError(Exception):
+    pass
+
+
+# -------- WAV / RIFF --------
+
+_WAV_CODECS = {(1, 16): "pcm_s16le", (1, 24): "pcm_s24le", (1, 32): "pcm_s32le", (3, 32): "pcm_f32le", (3, 64): "pcm_f64le"}
+
+
+def _probe_wav(path: Path, file_size: int) -> MediaInfo:
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            raise ProbeError("not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            ch = f.read(8)
+            if len(ch) < 8:
+                raise ProbeError("no data chunk")
+            cid, size = ch[:4], struct.unpack("<I", ch[4:])[0]
+            if cid == b"fmt ":
+                body = f.read(size + (size & 1))
+                tag, channels, sr, _byte_rate, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == 0xFFFE and size >= 26:  # WAVE_FORMAT_EXTENSIBLE: real tag in SubFormat GUID
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, sr, block_align, bits)
+            elif cid == b"data":
+                if fmt is None:
+                    raise ProbeError("data before fmt")
+                data_start = f.tell()
+                # streamed writers leave 0 / 0xFFFFFFFF here; trust the file size instead
+                if size in (0, 0xFFFFFFFF) or data_start + size > file_size:
+                    size = file_size - data_start
+                tag, channels, sr, block_align, bits = fmt
+                if not sr or not block_align:
+                    raise ProbeError("bad fmt chunk")
+                return MediaInfo(
+                    duration=(size // block_align) / float(sr),
+                    container="wav",
+                    codec=_WAV_CODECS.get((tag, bits), f"wav_0x{tag:04x}"),
+                    sample_rate=sr,
+                    channels=channels,
+                )
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+# -------- MP4 / ISO BMFF --------
+
+_MP4_CODECS = {
+    b"avc1": "h264", b"avc3": "h264", b"hvc1": "hevc", b"hev1": "hevc",
+    b"av01": "av1", b"vp09": "vp9", b"mp4v": "mpeg4", b"mp4a": "aac",
+    b"Opus": "opus", b"fLaC": "flac", b"ac-3": "ac3", b"ec-3": "eac3",
+}
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Yields (type, payload_start, payload_end) for sibling boxes in data[start:end].
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, btype = struct.unpack(">I4s", data[pos:pos + 8])
+        hdr = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            hdr = 16
+        elif size == 0:
+            size = end - pos
+        if size < hdr or pos + size > end:
+            return
+        yield btype, pos + hdr, pos + size
+        pos += size
+
+
+def _child(data: bytes, start: int, end: int, btype: bytes) -> Optional[Tuple[int, int]]:
+    for t, s, e in _iter_boxes(data, start, end):
+        if t == btype:
+            return s, e
+    return None
+
+
+def _full_box_times(data: bytes, s: int) -> Tuple[int, int]:
+    """(timescale, duration) from an mvhd/mdhd payload."""
+    if data[s] == 1:
+        return struct.unpack(">IQ", data[s + 20:s + 32])
+    return struct.unpack(">II", data[s + 12:s + 20])
+
+
+def parse_moov(moov: bytes) -> MediaInfo:
+    """
+    moov: the payload of the 'moov' box (without its 8/16 byte header).
+    Shared with streaming validators that only have the first bytes of a file.
+    """
+    mvhd = _child(moov, 0, len(moov), b"mvhd")
+    if mvhd is None:
+        raise ProbeError("moov without mvhd")
+    timescale, duration = _full_box_times(moov, mvhd[0])
+    if not timescale:
+        raise ProbeError("mvhd timescale is 0")
+
+    v_codec = a_codec = None
+    width = height = sample_rate = channels = None
+
+    for t, s, e in _iter_boxes(moov):
+        if t != b"trak":
+            continue
+        mdia = _child(moov, s, e, b"mdia")
+        if mdia is None:
+            continue
+        hdlr = _child(moov, mdia[0], mdia[1], b"hdlr")
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b""
+        minf = _child(moov, mdia[0], mdia[1], b"minf")
+        stbl = _child(moov, minf[0], minf[1], b"stbl") if minf else None
+        stsd = _child(moov, stbl[0], stbl[1], b"stsd") if stbl else None
+        if stsd is None:
+            continue
+        entry = stsd[0] + 8  # skip version/flags + entry_count
+        if entry + 8 > stsd[1]:
+            continue
+        fourcc = moov[entry + 4:entry + 8]
+        body = entry + 8
+
+        if handler == b"vide" and v_codec is None:
+            v_codec = _MP4_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+            width, height = struct.unpack(">HH", moov[body + 24:body + 28])
+        elif handler == b"soun" and a_codec is None:
+            a_codec = _MP4_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+            channels = struct.unpack(">H", moov[body + 16:body + 18])[0]
+            sample_rate = struct.unpack(">I", moov[body + 24:body + 28])[0] >> 16
+
+    return MediaInfo(
+        duration=duration / float(timescale),
+        container="mp4",
+        codec=v_codec or a_codec,
+        width=width,
+        height=height,
+        sample_rate=sample_rate,
+        channels=channels,
+    )
+
+
+class MoovSniffer:
+    """
+    Walks the top-level boxes of an MP4 while it is still arriving.
+    feed(chunk) returns MediaInfo as soon as a complete moov has been seen
+    (faststart files: within the first few hundred KB). When mdat comes first,
+    moov_offset is set to where the next box starts, so the caller can fetch
+    the moov with a Range request instead of waiting for the whole file.
+    """
+
+    MAX_MOOV = 64 << 20
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.pos = 0           # absolute offset of buf[0]
+        self.next_box = 0      # absolute offset of the next top-level box header
+        self.moov_offset: Optional[int] = None
+        self.info: Optional[MediaInfo] = None
+
+    def feed(self, chunk: bytes) -> Optional[MediaInfo]:
+        if self.info is not None:
+            return self.info
+        self.buf += chunk
+        while True:
+            rel = self.next_box - self.pos
+            if rel >= len(self.buf):  # still inside a box we skip (mdat, free, ...)
+                self.pos += len(self.buf)
+                self.buf.clear()
+                return None
+            del self.buf[:rel]
+            self.pos = self.next_box
+            if len(self.buf) < 8:
+                return None
+
+            size, btype = struct.unpack(">I4s", self.buf[:8])
+            hlen = 8
+            if size == 1:
+                if len(self.buf) < 16:
+                    return None
+                size = struct.unpack(">Q", self.buf[8:16])[0]
+                hlen = 16
+            if self.pos == 0 and btype != b"ftyp":
+                raise ProbeError("not an ISO BMFF file")
+            if size == 0 or size < hlen:
+                raise ProbeError("unsized or corrupt top-level box")
+
+            if btype == b"moov":
+                if size > self.MAX_MOOV:
+                    raise ProbeError("moov too large")
+                if len(self.buf) < size:
+                    return None
+                self.info = parse_moov(bytes(self.buf[hlen:size]))
+                self.buf.clear()
+                return self.info
+            if btype == b"mdat" and self.moov_offset is None:
+                self.moov_offset = self.pos + size
+            self.next_box = self.pos + size
+
+
+def _probe_mp4(path: Path, file_size: int) -> MediaInfo:
+    with open(path, "rb") as f:
+        pos = 0
+        first = True
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            hdr = f.read(16)
+            size, btype = struct.unpack(">I4s", hdr[:8])
+            hlen = 8
+            if size == 1:
+                size = struct.unpack(">Q", hdr[8:16])[0]
+                hlen = 16
+            elif size == 0:
+                size = file_size - pos
+            if first and btype != b"ftyp":
+                raise ProbeError("not an ISO BMFF file")
+            first = False
+            if size < hlen:
+                raise ProbeError("corrupt box header")
+            if btype == b"moov":
+                f.seek(pos + hlen)
+                return parse_moov(f.read(size - hlen))
+            pos += size
+    raise ProbeError("no moov box")
+
+
+# -------- ffprobe fallback --------
+
+def _probe_ffprobe(path: Path) -> MediaInfo:
+    r = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration,format_name:stream=codec_type,codec_name,width,height,sample_rate,channels",
+            "-of", "json",
+            str(path),
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    j = json.loads(r.stdout or "{}")
+    streams = j.get("streams", [])
+    v = next((s for s in streams if s.get("codec_type") == "video"), {})
+    a = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    fmt = j.get("format", {})
+    return MediaInfo(
+        duration=float(fmt.get("duration") or 0.0),
+        container=(fmt.get("format_name") or "").split(",")[0],
+        codec=v.get("codec_name") or a.get("codec_name"),
+        width=v.get("width"),
+        height=v.get("height"),
+        sample_rate=int(a["sample_rate"]) if a.get("sample_rate") else None,
+        channels=a.get("channels"),
+    )
+
+
+# -------- public API --------
+
+_MEMO: Dict[Tuple[str, int, int], MediaInfo] = {}
+_MEMO_LOCK = threading.Lock()
+
+
+def probe(path: Path) -> MediaInfo:
+    """
+    Duration / codec / resolution / sample rate without spawning a process
+    for WAV and MP4/MOV; anything else (or anything unparsable) goes to ffprobe.
+    Memoised on (path, mtime, size).
+    """
+    path = Path(path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    with _MEMO_LOCK:
+        hit = _MEMO.get(key)
+    if hit is not None:
+        return hit
+
+    with open(path, "rb") as f:
+        magic = f.read(12)
+
+    info = None
+    try:
+        if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+            info = _probe_wav(path, st.st_size)
+        elif magic[4:8] == b"ftyp":
+            info = _probe_mp4(path, st.st_size)
+    except (ProbeError, struct.error) as e:
+        print(f"[WARN] Header probe failed for {path.name} ({e}), using ffprobe", flush=True)
+
+    if info is None:
+        info = _probe_ffprobe(path)
+
+    with _MEMO_LOCK:
+        _MEMO[key] = info
+    return info
+
+
+def probe_duration(path: Path) -> float:
+    return probe(path).duration
@@ -1,10 +1,18 @@
+import hashlib
+import json
 import os
 import random
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-import requests
-import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
 
-PEXELS_API = "https://api.pexels.com/videos/search"
+from src.fileutil import link_or_copy
+from src.media_probe import MediaInfo, MoovSniffer, ProbeError, parse_moov, probe_duration
+
+PEXELS_API = os.getenv("PEXELS_API_URL", "https://api.pexels.com/videos/search")
 
 PEXELS_QUERIES = [
     "oddly satisfying close up",
@@ -18,119 +26,345 @@ PEXELS_QUERIES = [
     "resin art close up",
 ]
 
-def ffprobe_duration(path: Path) -> float:
-    r = subprocess.run(
-        ["ffprobe","-v","error","-show_entries","format=duration",
-         "-of","default=noprint_wrappers=1:nokey=1", str(path)],
-        capture_output=True, text=True, check=True
+SEARCH_CACHE_DIR = Path(os.getenv("PEXELS_SEARCH_CACHE", ".cache/pexels"))
+SEARCH_TTL = int(os.getenv("PEXELS_SEARCH_TTL", str(6 * 3600)))   # seconds
+PARALLEL = int(os.getenv("PEXELS_PARALLEL", "2"))                 # candidates downloaded at once
+HEDGE_SEC = float(os.getenv("PEXELS_HEDGE_SEC", "4"))             # start one more if nothing finished by then
+TIMEOUT = (10, 30)                                                # (connect, read) seconds
+DL_CHUNK = 256 * 1024                                             # early-abort granularity
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _session():
+    """
+    One pooled requests.Session for search + downloads (shared by the
+    pipeline and the library prefetcher); GETs retry on 429/5xx.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PARALLEL + 4, max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            # PEXELS_API_URL may point at a plain-http stand-in; same pool + retries there
+            s.mount("http://", adapter)
+            _SESSION = s
+        return _SESSION
+
+
+# -------- search (TTL cached in memory + on disk) --------
+
+_SEARCH_MEMO: Dict[str, Tuple[float, list]] = {}
+
+
+def search_videos(query: str, per_page: int = 40) -> list:
+    key = hashlib.sha1(f"{PEXELS_API}|{query}|{per_page}".encode("utf-8")).hexdigest()[:16]
+    now = time.time()
+
+    hit = _SEARCH_MEMO.get(key)
+    if hit is not None and now - hit[0] < SEARCH_TTL:
+        return hit[1]
+
+    disk = SEARCH_CACHE_DIR / f"{key}.json"
+    try:
+        j = json.loads(disk.read_text())
+        if now - j["t"] < SEARCH_TTL:
+            _SEARCH_MEMO[key] = (j["t"], j["videos"])
+            print(f"[BG] Search cache hit '{query}' ({len(j['videos'])} videos)", flush=True)
+            return j["videos"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    r = _session().get(
+        PEXELS_API,
+        headers={"Authorization": os.environ["PEXELS_API_KEY"]},
+        params={"query": query, "orientation": "portrait", "per_page": per_page},
+        timeout=TIMEOUT,
     )
-    return float(r.stdout.strip())
+    r.raise_for_status()
+    videos = r.json().get("videos", [])
+
+    _SEARCH_MEMO[key] = (now, videos)
+    try:
+        SEARCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = disk.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"t": now, "query": query, "videos": videos}))
+        os.replace(tmp, disk)
+    except OSError as e:
+        print(f"[WARN] Search cache write failed: {e}", flush=True)
+    return videos
+
+
+# -------- download / validate --------
+
+class ClipRejected(Exception):
+    """Candidate failed validation before (or without) being fully downloaded."""
+
 
-def _download(url: str, out_path: Path, timeout: int = 180) -> None:
+ClipCheck = Callable[[MediaInfo], Optional[str]]
+
+
+def _range_moov(url: str, offset: int, timeout=TIMEOUT) -> Optional[MediaInfo]:
+    """
+    moov of a file whose mdat comes first: one Range request starting at the
+    box after mdat, read only as far as the moov box. None if the server
+    ignores Range or the box there is not a moov.
+    """
+    with _session().get(url, headers={"Range": f"bytes={offset}-"}, stream=True, timeout=timeout) as rr:
+        if rr.status_code != 206:
+            return None
+        buf = bytearray()
+        need = 16
+        for chunk in rr.iter_content(DL_CHUNK):
+            buf += chunk
+            if len(buf) >= 16 and need == 16:
+                size, btype = struct.unpack(">I4s", buf[:8])
+                hlen = 8
+                if size == 1:
+                    size, hlen = struct.unpack(">Q", buf[8:16])[0], 16
+                if btype != b"moov" or size < hlen or size > MoovSniffer.MAX_MOOV:
+                    return None
+                need = size
+            if len(buf) >= need > 16:
+                return parse_moov(bytes(buf[hlen:need]))
+    return None
+
+
+def _download(
+    url: str,
+    out_path: Path,
+    timeout=TIMEOUT,
+    abort: Optional[threading.Event] = None,
+    min_bytes: int = 0,
+    check: Optional[ClipCheck] = None,
+) -> bool:
+    """
+    Streams url into out_path over the shared session.
+    - Content-Length below min_bytes is rejected before any body is read
+    - moov is parsed as bytes arrive (or fetched with a Range request when
+      mdat comes first) and check(info) can reject the clip mid-transfer
+    Raises ClipRejected; returns False (partial file removed) if abort was set.
+    """
     if out_path.exists():
         out_path.unlink()
 
-    with requests.get(url, stream=True, timeout=timeout) as rr:
-        rr.raise_for_status()
-        with open(out_path, "wb") as f:
-            for chunk in rr.iter_content(1024 * 1024):
-                if chunk:
+    sniff = MoovSniffer() if check is not None else None
+    try:
+        with _session().get(url, stream=True, timeout=timeout) as rr:
+            rr.raise_for_status()
+            length = int(rr.headers.get("Content-Length") or 0)
+            if length and length < min_bytes:
+                raise ClipRejected(f"too small ({length} bytes)")
+
+            with open(out_path, "wb") as f:
+                for chunk in rr.iter_content(DL_CHUNK):
+                    if abort is not None and abort.is_set():
+                        break
+                    if not chunk:
+                        continue
                     f.write(chunk)
+                    if sniff is None:
+                        continue
 
-def download_bg_from_pexels(out_path: Path) -> Path:
+                    try:
+                        info = sniff.feed(chunk)
+                        if info is None and sniff.moov_offset is not None:
+                            info = _range_moov(url, sniff.moov_offset)
+                            if info is None:
+                                sniff = None  # no Range support: validate after the download
+                    except (ProbeError, struct.error) as e:
+                        print(f"[WARN] Stream probe gave up ({e}), validating after download", flush=True)
+                        info, sniff = None, None
+                    if info is not None:
+                        sniff = None
+                        reason = check(info)
+                        if reason:
+                            raise ClipRejected(f"{reason} after {f.tell()}/{length or '?'} bytes")
+                else:
+                    return True
+    except BaseException:
+        out_path.unlink(missing_ok=True)
+        raise
+    out_path.unlink(missing_ok=True)
+    return False
+
+
+def _best_rendition(files: list) -> Optional[Tuple[str, int, int]]:
+    # Prefer portrait and decent height, but don't be too strict
+    cand = []
+    for f in files:
+        w = f.get("width") or 0
+        h = f.get("height") or 0
+        link = f.get("link")
+        size = f.get("file_size") or 0
+        if not link:
+            continue
+        if h > w and h >= 720:  # portrait-ish
+            # aspect closeness + size hint
+            cand.append((abs((w / h) - (9 / 16)), 0 if size == 0 else abs(size - 8_000_000), link, w, h))
+    if not cand:
+        return None
+    cand.sort(key=lambda x: (x[0], x[1]))
+    return cand[0][2:]
+
+
+def _fetch_candidate(url: str, part: Path, abort: threading.Event, min_bytes: int, min_dur: float) -> Optional[float]:
+    """Download + validate one candidate; returns its duration or None (part removed)."""
+
+    def check(info: MediaInfo) -> Optional[str]:
+        if info.duration < min_dur:
+            return f"too short ({info.duration:.1f}s)"
+        # coded size only: rotation metadata can swap w/h, so no orientation test here
+        if info.width and info.height and max(info.width, info.height) < 720:
+            return f"too small ({info.width}x{info.height})"
+        return None
+
+    try:
+        if not _download(url, part, abort=abort, min_bytes=min_bytes, check=check):
+            return None
+        if abort.is_set():  # finished after another candidate already won
+            part.unlink(missing_ok=True)
+            return None
+
+        actual = part.stat().st_size
+        if actual < min_bytes:
+            print(f"[WARN] BG too small ({actual} bytes), retry...", flush=True)
+        else:
+            try:
+                dur = probe_duration(part)
+            except Exception as e:
+                print(f"[WARN] probe failed: {e}, retry...", flush=True)
+            else:
+                if dur >= min_dur:
+                    return dur
+                print(f"[WARN] BG too short ({dur:.1f}s), retry...", flush=True)
+    except ClipRejected as e:
+        print(f"[WARN] BG rejected early: {e}", flush=True)
+    except Exception as e:
+        if not abort.is_set():
+            print(f"[WARN] Download failed: {e}", flush=True)
+    part.unlink(missing_ok=True)
+    return None
+
+
+def _race(cands: List[Tuple[int, str, int, int]], out_path: Path, min_bytes: int, min_dur: float) -> Optional[Tuple[int, float]]:
     """
-    Robust downloader:
-    - Accepts >= 6s clips (we will loop to 35s anyway)
-    - Accepts small files too (>= 700KB)
-    - If Pexels fails completely, uses local fallback if exists.
+    cands: [(video_id, url, w, h)] best first.
+    PARALLEL candidates download at once; if none finishes within HEDGE_SEC a
+    hedged extra request starts; failures are replaced by the next candidate.
+    The first clip that validates wins and the rest are aborted.
     """
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+    abort = threading.Event()
+    todo = list(cands)
+    pending = {}
+    winner = None
+    ex = ThreadPoolExecutor(max_workers=PARALLEL + 1, thread_name_prefix="pexels-dl")
 
-    # fallback (optional)
-    fallback = Path("assets/fallback_bg.mp4")
+    def launch():
+        vid, url, w, h = todo.pop(0)
+        part = out_path.with_name(f"{out_path.stem}.{vid}.part")
+        print(f"[BG] Trying {vid} {w}x{h} ({url[:60]}...)", flush=True)
+        pending[ex.submit(_fetch_candidate, url, part, abort, min_bytes, min_dur)] = (vid, part)
+
+    try:
+        while todo and len(pending) < PARALLEL:
+            launch()
+        while pending and winner is None:
+            done, _ = wait(pending, timeout=HEDGE_SEC, return_when=FIRST_COMPLETED)
+            if not done:
+                if todo and len(pending) <= PARALLEL:
+                    print(f"[BG] Nothing finished in {HEDGE_SEC:g}s, hedging", flush=True)
+                    launch()
+                continue
+            for fut in done:
+                vid, part = pending.pop(fut)
+                dur = fut.result()
+                if dur is not None and winner is None:
+                    os.replace(part, out_path)
+                    winner = (vid, dur)
+                elif dur is not None:
+                    part.unlink(missing_ok=True)
+            while winner is None and todo and len(pending) < PARALLEL:
+                launch()
+    finally:
+        abort.set()
+        # losers notice abort on their next chunk and clean up their own .part files
+        ex.shutdown(wait=False, cancel_futures=True)
+    return winner
 
-    key = os.environ["PEXELS_API_KEY"]
-    headers = {"Authorization": key}
+
+def fetch_pexels_clip(out_path: Path, skip_id: Optional[Callable[[int], bool]] = None, attempts: int = 9) -> Optional[int]:
+    """
+    One validated portrait clip from Pexels into out_path.
+    skip_id(video_id) -> True skips videos we already have (checked before downloading).
+    Each attempt uses a different query (search responses are TTL cached).
+    Returns the Pexels video id, or None if every attempt failed.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
 
     min_dur = int(os.getenv("PEXELS_MIN_DUR", "6"))              # seconds
     min_bytes = int(os.getenv("PEXELS_MIN_BYTES", "700000"))     # ~0.7MB
 
-    for attempt in range(1, 10):
-        q = random.choice(PEXELS_QUERIES)
+    queries = random.sample(PEXELS_QUERIES, len(PEXELS_QUERIES))
+    for attempt, q in enumerate(queries[:attempts], start=1):
         print(f"[BG] Search attempt {attempt} query='{q}'", flush=True)
 
-        r = requests.get(
-            PEXELS_API,
-            headers=headers,
-            params={"query": q, "orientation": "portrait", "per_page": 40},
-            timeout=30,
-        )
-        r.raise_for_status()
-        videos = r.json().get("videos", [])
+        videos = list(search_videos(q))
         if not videos:
             continue
 
         random.shuffle(videos)
 
+        cands = []
         for v in videos[:12]:
-            files = v.get("video_files", [])
-            if not files:
+            vid = v.get("id")
+            if vid is None or (skip_id is not None and skip_id(vid)):
                 continue
+            best = _best_rendition(v.get("video_files", []))
+            if best is not None:
+                cands.append((vid, *best))
 
-            # Prefer portrait and decent height, but don't be too strict
-            cand = []
-            for f in files:
-                w = f.get("width") or 0
-                h = f.get("height") or 0
-                link = f.get("link")
-                size = f.get("file_size") or 0
-                if not link:
-                    continue
-                if h > w and h >= 720:  # portrait-ish
-                    # aspect closeness + size hint
-                    cand.append((abs((w / h) - (9 / 16)), 0 if size == 0 else abs(size - 8_000_000), link, w, h, size))
-
-            if not cand:
-                continue
-
-            cand.sort(key=lambda x: (x[0], x[1]))
-
-            for _, __, url, w, h, size_hint in cand[:4]:
-                try:
-                    print(f"[BG] Trying {w}x{h} ({url[:60]}...)", flush=True)
-                    _download(url, out_path)
+        if cands:
+            t0 = time.perf_counter()
+            won = _race(cands, out_path, min_bytes, min_dur)
+            if won is not None:
+                vid, dur = won
+                print(
+                    f"[OK] BG ready: {out_path} ({dur:.1f}s, {out_path.stat().st_size} bytes, "
+                    f"{time.perf_counter() - t0:.1f}s)",
+                    flush=True,
+                )
+                return vid
 
-                    if not out_path.exists():
-                        continue
-
-                    actual = out_path.stat().st_size
-                    if actual < min_bytes:
-                        print(f"[WARN] BG too small ({actual} bytes), retry...", flush=True)
-                        continue
-
-                    try:
-                        dur = ffprobe_duration(out_path)
-                    except Exception as e:
-                        print(f"[WARN] ffprobe failed: {e}, retry...", flush=True)
-                        continue
+        print("[WARN] No valid BG this attempt, retrying...", flush=True)
 
-                    if dur < min_dur:
-                        print(f"[WARN] BG too short ({dur:.1f}s), retry...", flush=True)
-                        continue
+    return None
 
-                    print(f"[OK] BG ready: {out_path} ({dur:.1f}s, {actual} bytes)", flush=True)
-                    return out_path
 
-                except Exception as e:
-                    print(f"[WARN] Download failed: {e}", flush=True)
-                    continue
+def download_bg_from_pexels(out_path: Path) -> Path:
+    """
+    Robust downloader:
+    - Accepts >= 6s clips (we will loop to 35s anyway)
+    - Accepts small files too (>= 700KB)
+    - If Pexels fails completely, uses local fallback if exists.
+    """
+    # fallback (optional)
+    fallback = Path("assets/fallback_bg.mp4")
 
-        print("[WARN] No valid BG this attempt, retrying...", flush=True)
+    if fetch_pexels_clip(out_path) is not None:
+        return out_path
 
     # If all failed, fallback
     if fallback.exists():
         print("[WARN] Pexels failed; using fallback assets/fallback_bg.mp4", flush=True)
-        out_path.write_bytes(fallback.read_bytes())
+        link_or_copy(fallback, out_path)
         return out_path
 
     raise RuntimeError("Failed to download a valid satisfying portrait background from Pexels (and no fallback).")
@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from src.shorts_audio import synthesize_batch
+
+SENTENCE_GAP_SEC = float(os.getenv("LONG_SENTENCE_GAP", "0.45"))
+XFADE_SEC = float(os.getenv("LONG_SENTENCE_XFADE", "0.02"))
+
+
+def _fade(clip: np.ndarray, n: int) -> np.ndarray:
+    n = min(n, len(clip) // 2)
+    if n <= 0:
+        return clip
+    out = clip.astype(np.float32, copy=True)
+    ramp = np.linspace(0.0, 1.0, n, endpoint=False, dtype=np.float32)
+    out[:n] *= ramp
+    out[-n:] *= ramp[::-1]
+    return out
+
+
+def join_clips(clips: List[np.ndarray], sr: int, gap_sec: float = SENTENCE_GAP_SEC, xfade_sec: float = XFADE_SEC) -> np.ndarray:
+    """
+    Concatenate clips with gap_sec of silence between them.
+    Every clip gets xfade_sec fade in/out; with gap_sec=0 neighbours overlap
+    by xfade_sec instead (a real crossfade).
+    """
+    if not clips:
+        return np.zeros(0, dtype=np.float32)
+
+    xf = int(round(sr * xfade_sec))
+    gap = int(round(sr * gap_sec))
+    overlap = xf if gap == 0 else 0
+
+    faded = [_fade(c, xf) for c in clips]
+    total = sum(len(c) for c in faded) + (gap - overlap) * (len(faded) - 1)
+    out = np.zeros(max(total, max(len(c) for c in faded)), dtype=np.float32)
+
+    pos = 0
+    for c in faded:
+        out[pos:pos + len(c)] += c
+        pos += len(c) + gap - overlap
+    return out
+
+
+def _synth_sentences(sentences: List[str], speaker: str) -> Tuple[List[np.ndarray], int]:
+    # pool job: local model + clip cache (the daemon would serialise the pool)
+    return synthesize_batch([(s, speaker) for s in sentences], local=True)
+
+
+def iter_chapter_wavs(
+    chapters: List[dict],
+    out_dir: Path,
+    speaker: str,
+    gap_sec: float = SENTENCE_GAP_SEC,
+    xfade_sec: float = XFADE_SEC,
+    workers: int = 1,
+) -> Iterator[Tuple[Path, float]]:
+    """
+    chapters: [{"name", "sentences": [...]}, ...] from generate_long_story
+    Yields (chapter_wav, exact_seconds) in chapter order — same contract as
+    long_tts.iter_chapters, so the pipeline can swap one for the other.
+    Each chapter only synthesises the sentences no earlier chapter had, and
+    is yielded as soon as those are ready (LONG_STREAMING overlaps with the rest):
+    - workers <= 1: chapter by chapter, in-process (daemon aware)
+    - workers > 1: every chapter's new sentences go to the long_tts process
+      pool up front; chapters are joined in order as their batches finish
+    """
+    import soundfile as sf
+
+    # sentence -> index of the chapter whose batch synthesises it
+    first: Dict[str, int] = {}
+    new_per_chapter: List[List[str]] = []
+    for idx, ch in enumerate(chapters):
+        new = [s for s in dict.fromkeys(ch["sentences"]) if s not in first]
+        for s in new:
+            first[s] = idx
+        new_per_chapter.append(new)
+    total = sum(len(ch["sentences"]) for ch in chapters)
+    print(f"[TTS] Phrase library: {len(first)} distinct of {total} sentences", flush=True)
+
+    workers = max(1, min(workers, len(chapters)))
+    ex = None
+    futs: Dict[int, Future] = {}
+    if workers > 1:
+        from src.long_tts import tts_pool
+
+        ex = tts_pool(workers)
+        futs = {i: ex.submit(_synth_sentences, new, speaker) for i, new in enumerate(new_per_chapter) if new}
+
+    clips: Dict[str, np.ndarray] = {}
+    sr = 0
+    try:
+        for idx, ch in enumerate(chapters):
+            new = new_per_chapter[idx]
+            if new:
+                arrays, sr = futs[idx].result() if ex is not None else synthesize_batch([(s, speaker) for s in new])
+                clips.update(zip(new, arrays))
+            audio = join_clips([clips[s] for s in ch["sentences"]], sr, gap_sec, xfade_sec)
+            wav = out_dir / f"chapter_{idx + 1:02d}.wav"
+            sf.write(str(wav), np.clip(audio, -1.0, 1.0), sr, subtype="PCM_16")
+            yield wav, len(audio) / float(sr)
+    finally:
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
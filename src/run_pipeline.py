@@ -1,17 +1,21 @@
 import os
+import shutil
 import subprocess
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Iterable
 import urllib.request
 
-from TTS.api import TTS
-from src.youtube_upload import upload_video
+from src.media_probe import probe_duration
+from src.tts_models import model_stats
+from src.youtube_upload import UploadManager
 from src.long_story import generate_long_story
 from src.long_video import render_long_video
-from src.long_audio import build_long_audio_with_ambient
+from src.long_audio import build_long_audio_with_ambient, VoiceTrackWriter
+from src.long_tts import iter_chapters
+from src.phrase_library import iter_chapter_wavs
 
 OUT = Path("out")
-OUT.mkdir(exist_ok=True)
 
 
 def run(cmd):
@@ -27,30 +31,6 @@ def fmt_ts(seconds: int) -> str:
     return f"{m:02d}:{s:02d}"
 
 
-def ffprobe_duration(path: Path) -> float:
-    r = subprocess.run(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(path),
-        ],
-        capture_output=True,
-        text=True,
-        check=True,
-    )
-    return float(r.stdout.strip())
-
-
-def tts_to_wav(text: str, wav_path: Path, speaker: str):
-    tts = TTS(model_name="tts_models/en/vctk/vits", gpu=False, progress_bar=False)
-    tts.tts_to_file(text=text, file_path=str(wav_path), speaker=speaker)
-
-
 def download_bg_long(out_path: Path):
     """
     Guaranteed background image for long video.
@@ -66,23 +46,40 @@ def download_bg_long(out_path: Path):
         raise RuntimeError(f"[BG] Download failed or too small: {out_path}")
 
 
-def cleanup_out():
+def cleanup_out(keep: Iterable[str] = ()):
     """
     Default: delete everything in out/ so free tier disk never fills.
+    `keep`: videos whose upload has not finished (the next run resumes them).
     """
+    keep = {str(Path(k).resolve()) for k in keep}
     try:
         for p in OUT.glob("*"):
+            if str(p.resolve()) in keep:
+                print(f"[CLEAN] Keeping {p.name}: upload still pending", flush=True)
+                continue
             if p.is_file():
                 p.unlink()
+            else:
+                # long_segments/ from the loop / parallel render modes
+                shutil.rmtree(p, ignore_errors=True)
     except Exception as e:
         print("[WARN] cleanup failed:", e, flush=True)
 
 
 def main():
+    OUT.mkdir(exist_ok=True)
+
     # --- SETTINGS ---
     minutes = int(os.getenv("LONG_MINUTES", "60"))   # 45-80 arası
     speaker = os.getenv("LONG_SPEAKER", "p225")      # p225, p226 etc.
     privacy = os.getenv("YT_DEFAULT_PRIVACY", "public")
+    tts_workers = int(os.getenv("LONG_TTS_WORKERS", "1"))  # >1 = process pool
+    tts_mode = os.getenv("LONG_TTS_MODE", "chapters")  # chapters | phrases
+    streaming = os.getenv("LONG_STREAMING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+    # uploads deferred by an exhausted quota drain while this run renders
+    uploads = UploadManager()
+    uploads.drain_spool()
 
     # --- 0) Background (guarantee it exists) ---
     bg_img = OUT / "bg_long.jpg"
@@ -90,28 +87,49 @@ def main():
 
     # --- 1) STORY ---
     story = generate_long_story(target_minutes=minutes)
-    # story: dict {title, theme, chapters:[{name, text}], hashtags, tags}
+    # story: dict {title, theme, chapters:[{name, text, sentences}], hashtags, tags}
 
     # --- 2) TTS per chapter (timestamps) ---
-    chapter_wavs = []
-    timestamps = []
-    current_sec = 0
+    jobs = [
+        (ch["text"], OUT / f"chapter_{idx:02d}.wav", speaker)
+        for idx, ch in enumerate(story["chapters"], start=1)
+    ]
+
+    pause_sec = 4
+    final_audio = OUT / "audio_full.wav"
 
-    for idx, ch in enumerate(story["chapters"], start=1):
-        wav = OUT / f"chapter_{idx:02d}.wav"
-        tts_to_wav(ch["text"], wav, speaker=speaker)
+    # streaming: each finished chapter goes straight into the final track
+    # while the next one is synthesised
+    voice_track = VoiceTrackWriter(final_audio, pause_sec=pause_sec) if streaming else None
 
-        dur = int(round(ffprobe_duration(wav)))
-        timestamps.append((current_sec, ch["name"]))
-        current_sec += dur + 4  # +4 sec pause
+    chapter_wavs = []
+    timestamps = []
+    current_sec = 0.0
+
+    if tts_mode == "phrases":
+        # each distinct sentence synthesised once (per chapter, over the worker pool),
+        # chapters joined in NumPy
+        chapter_iter = iter_chapter_wavs(story["chapters"], OUT, speaker, workers=tts_workers)
+    else:
+        chapter_iter = iter_chapters(jobs, workers=tts_workers)
+
+    # exact float durations, rounded only for display (no per-chapter drift)
+    for ch, (wav, dur) in zip(story["chapters"], chapter_iter):
+        timestamps.append((int(round(current_sec)), ch["name"]))
+        current_sec += dur + pause_sec
         chapter_wavs.append(wav)
+        if voice_track is not None:
+            voice_track.add(wav)
+
+    print("[TTS] Model stats:", model_stats(), flush=True)
 
     # --- 3) Build final audio (voice concat + ambient mix + pauses) ---
-    voice_wav = OUT / "voice_full.wav"
-    final_audio = OUT / "audio_full.wav"
-    build_long_audio_with_ambient(chapter_wavs, voice_wav, final_audio, pause_sec=4)
+    if voice_track is not None:
+        voice_track.close()
+    else:
+        build_long_audio_with_ambient(chapter_wavs, None, final_audio, pause_sec=pause_sec)
 
-    total_dur = int(round(ffprobe_duration(final_audio)))
+    total_dur = int(round(probe_duration(final_audio)))
 
     # --- 4) Render long video + mux audio ---
     mp4 = OUT / "long.mp4"
@@ -138,7 +156,7 @@ def main():
 
     # --- 6) Upload ---
     thumb = OUT / "thumb.jpg"
-    upload_video(
+    uploads.submit(
         video_file=str(mp4),
         title=story["title"],
         description=description,
@@ -149,8 +167,12 @@ def main():
         thumbnail_file=str(thumb) if thumb.exists() else None,
     )
 
-    # --- 7) Cleanup ---
-    cleanup_out()
+    try:
+        uploads.close()
+    finally:
+        print(uploads.summary(), flush=True)
+        # --- 7) Cleanup ---
+        cleanup_out(keep=uploads.pending_files())
 
 
 if __name__ == "__main__":
@@ -1,15 +1,143 @@
 import subprocess
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Tuple
-from TTS.api import TTS
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from src.tts_cache import CACHE_MAX_CLIP_SEC, CACHE_SAMPLE_RATE, default_cache
+from src.tts_daemon import daemon_synthesize, try_tts_to_wav
+from src.tts_models import DEFAULT_MODEL, get_tts
+
+# sink(index, samples, sample_rate) — called once per synthesised line
+Sink = Callable[[int, np.ndarray, int], None]
+
 
 def run(cmd: List[str]):
     print(" ".join(cmd), flush=True)
     subprocess.run(cmd, check=True)
 
-def tts_to_wav(text: str, wav_path: Path, speaker: str):
-    tts = TTS(model_name="tts_models/en/vctk/vits", gpu=False, progress_bar=False)
-    tts.tts_to_file(text=text, file_path=str(wav_path), speaker=speaker)
+def tts_to_wav(text: str, wav_path: Path, speaker: str, model_name: str = DEFAULT_MODEL, use_daemon: bool = True):
+    """
+    One text to a WAV file: the TTS daemon if it is up (and use_daemon),
+    otherwise the in-process model. Shared by every single-file TTS caller.
+    """
+    if use_daemon and try_tts_to_wav(text, wav_path, speaker):
+        return
+    get_tts(model_name).tts_to_file(text=text, file_path=str(wav_path), speaker=speaker)
+
+def wav_sink(out_dir: Path, name: str = "m{:02d}.wav") -> Sink:
+    """
+    Optional file output for synthesize_batch: writes line i to out_dir/name.format(i+1).
+    """
+    import soundfile as sf
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    def _write(i: int, samples: np.ndarray, sr: int) -> None:
+        sf.write(str(out_dir / name.format(i + 1)), samples, sr, subtype="PCM_16")
+
+    return _write
+
+def synthesize_batch(
+    items: List[Tuple[str, str]],
+    model_name: str = DEFAULT_MODEL,
+    sink: Optional[Sink] = None,
+    local: bool = False,
+) -> Tuple[List[np.ndarray], int]:
+    """
+    items: [(text, speaker), ...]
+    Returns ([float32 mono samples per item, in input order], sample_rate).
+    Clips come from the on-disk cache when possible; the model is only
+    loaded for misses, which are deduplicated and grouped by speaker so each
+    speaker's lines run back-to-back. Nothing is written outside the cache unless a sink is given.
+    A running TTS daemon is used first unless local=True.
+    """
+    res = None if local else _daemon_batch(items, model_name)
+    if res is not None:
+        if sink is not None:
+            for i, samples in enumerate(res[0]):
+                sink(i, samples, res[1])
+        return res
+
+    cache = default_cache()
+    sr = CACHE_SAMPLE_RATE
+
+    out: List[Optional[np.ndarray]] = [None] * len(items)
+    if cache is not None:
+        for i, (text, spk) in enumerate(items):
+            out[i] = cache.get(text, spk, model_name, sr)
+
+    missing = [i for i, samples in enumerate(out) if samples is None]
+    if missing:
+        tts = get_tts(model_name)
+        model_sr = int(tts.synthesizer.output_sample_rate)
+        if model_sr != sr:
+            print(f"[WARN] Model rate {model_sr} != TTS_SAMPLE_RATE {sr}; ignoring cached clips", flush=True)
+            sr = model_sr
+            missing = list(range(len(items)))
+
+        # speaker -> text -> indices: a line repeated in the batch is synthesised once
+        groups: "OrderedDict[str, OrderedDict[str, List[int]]]" = OrderedDict()
+        for i in missing:
+            text, spk = items[i]
+            groups.setdefault(spk, OrderedDict()).setdefault(text, []).append(i)
+
+        for spk, texts in groups.items():
+            for text, idxs in texts.items():
+                wav = np.asarray(tts.tts(text=text, speaker=spk), dtype=np.float32)
+                for i in idxs:
+                    out[i] = wav
+                if cache is not None and len(wav) <= CACHE_MAX_CLIP_SEC * sr:
+                    cache.put(text, spk, model_name, sr, wav)
+
+    if sink is not None:
+        for i, samples in enumerate(out):
+            sink(i, samples, sr)
+
+    return out, sr
+
+def _daemon_batch(items: List[Tuple[str, str]], model_name: str):
+    try:
+        return daemon_synthesize(items, model_name)
+    except Exception as e:
+        print(f"[WARN] TTS daemon failed, synthesising in-process: {e}", flush=True)
+        return None
+
+def mix_timeline(
+    items: List[Tuple[float, np.ndarray]],
+    sr: int,
+    total_sec: int = 35,
+    gains: Optional[List[float]] = None,
+    peak: float = 0.98,
+) -> np.ndarray:
+    """
+    In-process replacement for build_timeline_audio.
+    items: [(start_seconds, float32 samples), ...]
+    - each clip is added at a sample-accurate offset into one preallocated buffer
+    - gains: optional per-track linear gain
+    - clipping protection: if overlaps push the mix above `peak`, scale the whole mix down
+    Returns float32 mono samples, exactly total_sec long.
+    """
+    n_total = int(total_sec * sr)
+    mix = np.zeros(n_total, dtype=np.float32)
+
+    for i, (t, clip) in enumerate(items):
+        start = int(round(t * sr))
+        if start >= n_total:
+            continue
+        seg = clip[: n_total - start]
+        g = gains[i] if gains else 1.0
+        if g == 1.0:
+            mix[start:start + len(seg)] += seg
+        else:
+            mix[start:start + len(seg)] += seg * np.float32(g)
+
+    m = float(np.max(np.abs(mix))) if n_total else 0.0
+    if m > peak:
+        print(f"[AUDIO] Mix peak {m:.2f} > {peak:.2f}, scaling down", flush=True)
+        mix *= np.float32(peak / m)
+    return mix
 
 def build_timeline_audio(
     items: List[Tuple[float, Path]],
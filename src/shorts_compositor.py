@@ -0,0 +1,189 @@
+import bisect
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.encoding import x264_args
+from src.wp_overlay import overlay_content_height
+
+W, H = 1080, 1920
+
+
+def _load_states(overlays: List[Path], overlay_h: int, chat_h: int):
+    """
+    For each overlay (plus a leading "nothing shown" state):
+    - top:  rows [0, chat_h) composited over the black pad once, uint8 RGB
+    - band: rows [chat_h, overlay_h) where the chat overlaps the background,
+            kept as premultiplied RGB + (255 - alpha) for per-frame blending
+    """
+    from PIL import Image
+
+    top_h = min(chat_h, overlay_h)
+    band_h = max(0, overlay_h - chat_h)
+
+    tops = [np.zeros((top_h, W, 3), dtype=np.uint8)]
+    bands = [None]
+    for p in overlays:
+        with Image.open(p) as im:
+            rgba = np.asarray(im.convert("RGBA"))[:overlay_h]
+        rgb = rgba[..., :3].astype(np.uint16)
+        a = rgba[..., 3:4].astype(np.uint16)
+        premul = rgb * a
+        tops.append(((premul[:top_h] + 127) // 255).astype(np.uint8))
+        if band_h:
+            bands.append((premul[top_h:], (255 - a[top_h:])))
+        else:
+            bands.append(None)
+    return tops, bands, top_h, band_h
+
+
+def render_final_numpy(
+    bg_mp4: Path,
+    overlays: List[Path],
+    times: List[float],
+    out_mp4: Path,
+    duration: float,
+    chat_h: int = 860,
+    audio_wav: Optional[Path] = None,
+    audio_pcm: Optional[Tuple[np.ndarray, int]] = None,
+    fps: int = 30,
+    bg_conformed: bool = False,
+) -> dict:
+    """
+    Alternative to render_final's filter graph:
+    - ffmpeg decodes the background once (scaled/cropped/graded) to rgb24 on a pipe
+    - the chat overlay is alpha-blended in NumPy; rows above chat_h are only
+      rewritten when the visible overlay changes, the overlap band every frame
+    - raw RGB frames go to one x264 encoder on stdin (audio via a second pipe)
+    bg_conformed=True skips scale/crop/grade (bg_store.conform_bg already did it).
+    Returns timing stats (decode / composite / encode-write seconds).
+    """
+    assert len(overlays) == len(times), "overlays and times must have same length"
+    bottom_h = H - chat_h
+    n_frames = int(round(duration * fps))
+
+    overlay_h = overlay_content_height(overlays)
+    tops, bands, top_h, band_h = _load_states(overlays, overlay_h, chat_h)
+
+    if bg_conformed:
+        vf = f"fps={fps}"
+    else:
+        vf = (
+            f"scale=1080:{bottom_h}:force_original_aspect_ratio=increase,"
+            f"crop=1080:{bottom_h},"
+            f"eq=contrast=1.05:saturation=1.10,"
+            f"fps={fps}"
+        )
+    dec = subprocess.Popen(
+        [
+            "ffmpeg", "-v", "error",
+            "-stream_loop", "-1", "-i", str(bg_mp4),
+            "-vf", vf,
+            "-t", str(duration),
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+        ],
+        stdout=subprocess.PIPE,
+    )
+
+    enc_cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{W}x{H}", "-r", str(fps), "-i", "pipe:0",
+    ]
+    audio_r = audio_w = None
+    if audio_pcm is not None:
+        pcm, sr = audio_pcm
+        audio_r, audio_w = os.pipe()
+        enc_cmd += ["-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", f"pipe:{audio_r}"]
+    else:
+        enc_cmd += ["-i", str(audio_wav)]
+    enc_cmd += [
+        "-map", "0:v", "-map", "1:a",
+        "-t", str(duration),
+        *x264_args("shorts"),
+        "-c:a", "aac", "-b:a", "160k",
+        "-movflags", "+faststart",
+        str(out_mp4),
+    ]
+    print(" ".join(enc_cmd), flush=True)
+    enc = subprocess.Popen(enc_cmd, stdin=subprocess.PIPE, pass_fds=(audio_r,) if audio_r is not None else ())
+
+    audio_t = None
+    if audio_w is not None:
+        os.close(audio_r)
+
+        def _feed_audio():
+            with os.fdopen(audio_w, "wb") as f:
+                try:
+                    f.write(np.ascontiguousarray(pcm, dtype="<f4").tobytes())
+                except BrokenPipeError:
+                    pass
+
+        audio_t = threading.Thread(target=_feed_audio, name="audio-feed", daemon=True)
+        audio_t.start()
+
+    frame = np.zeros((H, W, 3), dtype=np.uint8)
+    bg_view = frame[chat_h:]
+    band_view = frame[chat_h:chat_h + band_h]
+    tmp = np.empty((band_h, W, 3), dtype=np.uint16)
+    # clean copy of the decoded background under the band; the blend is done in place,
+    # so a repeated (short read) frame must be restored before blending again
+    band_bg = np.zeros((band_h, W, 3), dtype=np.uint8)
+    frame_bytes = W * bottom_h * 3
+
+    stats = {"frames": n_frames, "state_changes": 0, "decode_sec": 0.0, "composite_sec": 0.0, "encode_sec": 0.0}
+    state = -1
+    try:
+        for n in range(n_frames):
+            t0 = time.perf_counter()
+            raw = dec.stdout.read(frame_bytes)
+            if len(raw) == frame_bytes:
+                bg_view[:] = np.frombuffer(raw, dtype=np.uint8).reshape(bottom_h, W, 3)
+                band_bg[:] = band_view
+            # short read: background ended early, keep the last frame
+            t1 = time.perf_counter()
+
+            # index into tops/bands: 0 = nothing shown yet
+            s = bisect.bisect_right(times, n / fps)
+            if s != state:
+                frame[:top_h] = tops[s]
+                state = s
+                stats["state_changes"] += 1
+            if band_h:
+                band_view[:] = band_bg
+            if band_h and bands[s] is not None:
+                premul, inv_a = bands[s]
+                np.multiply(band_bg, inv_a, out=tmp)
+                tmp += premul
+                tmp += 127
+                tmp //= 255
+                band_view[:] = tmp
+            t2 = time.perf_counter()
+
+            enc.stdin.write(frame.data)
+            t3 = time.perf_counter()
+
+            stats["decode_sec"] += t1 - t0
+            stats["composite_sec"] += t2 - t1
+            stats["encode_sec"] += t3 - t2
+    finally:
+        enc.stdin.close()
+        dec.stdout.close()
+        dec.kill()
+        dec.wait()
+        if audio_t is not None:
+            audio_t.join()
+        rc = enc.wait()
+
+    if rc != 0:
+        raise RuntimeError(f"Encoder failed with exit code {rc}")
+
+    for k in ("decode_sec", "composite_sec", "encode_sec"):
+        stats[k] = round(stats[k], 2)
+    stats["composite_ms_per_frame"] = round(1000 * stats["composite_sec"] / max(1, n_frames), 3)
+    print("[COMPOSITE]", stats, flush=True)
+    return stats
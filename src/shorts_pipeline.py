@@ -5,19 +5,23 @@ import subprocess
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Tuple
-from src.topic_weights import generate_chat_script
+from typing import Iterable, List, Optional, Tuple
 
-from src.youtube_upload import upload_video, verify_auth
-from src.pexels_bg import download_bg_from_pexels
-from src.shorts_audio import tts_to_wav, build_timeline_audio
-from src.wp_overlay import render_whatsapp_overlays, Msg as WpMsg
-from src.titles import generate_title
+import numpy as np
+
+from src.topic_weights import generate_chat_script, REPLY_SAY_IT, REPLY_DONT_SEND
 
-title = generate_title()
+from src.youtube_upload import UploadManager, verify_auth
+from src.pexels_bg import download_bg_from_pexels
+from src.bg_store import BOTTOM_H, conform_bg
+from src.bg_library import acquire_bg
+from src.encoding import x264_args
+from src.shorts_audio import synthesize_batch, mix_timeline
+from src.shorts_compositor import render_final_numpy
+from src.tts_models import model_stats
+from src.wp_overlay import render_whatsapp_overlays, overlay_content_height, Msg as WpMsg
 
 OUT = Path("out")
-OUT.mkdir(exist_ok=True)
 
 DURATION = int(os.getenv("SHORTS_SECONDS", "35"))
 PRIVACY = (os.getenv("YT_DEFAULT_PRIVACY", "public") or "public").strip().lower()
@@ -30,15 +34,23 @@ INNER_SPK = os.getenv("SHORTS_INNER_SPEAKER", "p225")
 
 FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
 
+# ffmpeg: overlay filter graph | numpy: src.shorts_compositor raw-frame engine
+RENDER_ENGINE = os.getenv("SHORTS_RENDER_ENGINE", "ffmpeg").strip().lower()
 
-def run(cmd: List[str]):
+
+def run(cmd: List[str], input: Optional[bytes] = None):
     print(" ".join(cmd), flush=True)
-    subprocess.run(cmd, check=True)
+    subprocess.run(cmd, check=True, input=input)
 
 
-def cleanup_out():
+def cleanup_out(keep: Iterable[str] = ()):
+    # `keep`: videos whose upload has not finished (the next run resumes them)
+    keep = {str(Path(k).resolve()) for k in keep}
     try:
         for p in OUT.glob("*"):
+            if str(p.resolve()) in keep:
+                print(f"[CLEAN] Keeping {p.name}: upload still pending", flush=True)
+                continue
             if p.is_file():
                 p.unlink()
             else:
@@ -146,7 +158,7 @@ def generate_chat() -> Tuple[str, List[TimedLine]]:
     if two_person:
         lines = [
             ("A", hook),
-            ("B", "Say it."),
+            ("B", REPLY_SAY_IT),
             ("A", conf),
             ("B", twist),
             ("A", cliff),
@@ -154,7 +166,7 @@ def generate_chat() -> Tuple[str, List[TimedLine]]:
     else:
         lines = [
             ("A", hook),
-            ("INNER", "Don't send it."),
+            ("INNER", REPLY_DONT_SEND),
             ("A", conf),
             ("INNER", twist),
             ("A", cliff),
@@ -178,19 +190,59 @@ def generate_chat() -> Tuple[str, List[TimedLine]]:
 
 
 
+def write_overlay_sequence(overlays: List[Path], times: List[float], list_path: Path, total_sec: float) -> int:
+    """
+    One concat-demuxer input instead of N PNG inputs:
+    each overlay is shown from its start time until the next one starts
+    (a transparent frame covers [0, times[0])).
+    Returns the height of the non-transparent region (the chat area) so the
+    stream can be cropped before compositing.
+    """
+    from PIL import Image
+
+    overlay_h = overlay_content_height(overlays)
+    with Image.open(overlays[0]) as im:
+        size = im.size
+
+    entries: List[Tuple[Path, float]] = []
+    if times[0] > 0:
+        blank = list_path.parent / "overlay_blank.png"
+        Image.new("RGBA", size, (0, 0, 0, 0)).save(blank)
+        entries.append((blank, times[0]))
+    ends = list(times[1:]) + [float(total_sec)]
+    for p, t0, t1 in zip(overlays, times, ends):
+        entries.append((p, max(t1 - t0, 0.001)))
+
+    def _q(p: Path) -> str:
+        return "'" + str(p.resolve()).replace("'", "'\\''") + "'"
+
+    lines = ["ffconcat version 1.0"]
+    for p, d in entries:
+        lines += [f"file {_q(p)}", f"duration {d:.3f}"]
+    # concat demuxer ignores the last duration unless the file is repeated
+    lines.append(f"file {_q(entries[-1][0])}")
+    list_path.write_text("\n".join(lines) + "\n")
+    return overlay_h
+
+
 def render_final(
     bg_mp4: Path,
     overlays: List[Path],
     times: List[float],
-    audio_wav: Path,
+    audio_wav: Optional[Path],
     out_mp4: Path,
     chat_h: int = 860,
+    audio_pcm: Optional[Tuple[np.ndarray, int]] = None,
+    bg_conformed: bool = False,
 ):
     """
-    bg video: only in bottom area (below chat_h)
+    bg video: only in bottom area (below chat_h); bg_conformed=True means it
+              came from bg_store.conform_bg (already sized/graded, only padded)
     overlays: PNG overlays (full-size 1080x1920 with alpha)
-    times: start time for each overlay
-    audio: ONLY voices
+    times: start time for each overlay (ascending); fed to ffmpeg as a
+           single concat-demuxer image stream + one overlay filter
+    audio: ONLY voices — either audio_wav, or audio_pcm=(float32 mono, sr)
+           which is piped straight into the encoder (no WAV round trip)
     """
     assert len(overlays) == len(times), "overlays and times must have same length"
 
@@ -201,63 +253,85 @@ def render_final(
         "-stream_loop", "-1", "-i", str(bg_mp4),
     ]
 
-    for p in overlays:
-        cmd += ["-i", str(p)]
+    # all overlays as one timed image stream
+    seq = out_mp4.parent / "overlays.ffconcat"
+    overlay_h = write_overlay_sequence(overlays, times, seq, DURATION)
+    cmd += ["-f", "concat", "-safe", "0", "-i", str(seq)]
 
-    cmd += ["-i", str(audio_wav)]
+    if audio_pcm is not None:
+        pcm, sr = audio_pcm
+        cmd += ["-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0"]
+    else:
+        cmd += ["-i", str(audio_wav)]
 
     bottom_h = 1920 - chat_h
 
     vf = []
-    vf.append(
-        f"[0:v]"
-        f"scale=1080:{bottom_h}:force_original_aspect_ratio=increase,"
-        f"crop=1080:{bottom_h},"
-        f"eq=contrast=1.05:saturation=1.10"
-        f"[v0]"
-    )
-    vf.append(f"[v0]pad=1080:1920:0:{chat_h}:color=black[base]")
-
-    cur = "base"
-    for i, t_start in enumerate(times, start=1):
-        in_idx = i
-        out_lbl = f"v{i}"
+    if bg_conformed:
+        vf.append(f"[0:v]pad=1080:1920:0:{chat_h}:color=black[base]")
+    else:
         vf.append(
-            f"[{cur}][{in_idx}:v]"
-            f"overlay=0:0:enable=between(t\\,{t_start:.3f}\\,{float(DURATION):.3f})"
-            f"[{out_lbl}]"
+            f"[0:v]"
+            f"scale=1080:{bottom_h}:force_original_aspect_ratio=increase,"
+            f"crop=1080:{bottom_h},"
+            f"eq=contrast=1.05:saturation=1.10"
+            f"[v0]"
         )
-        cur = out_lbl
+        vf.append(f"[v0]pad=1080:1920:0:{chat_h}:color=black[base]")
+
+    # crop to the chat region so only those rows are blended on every frame
+    vf.append(f"[1:v]crop=1080:{overlay_h}:0:0[ov]")
+    vf.append("[base][ov]overlay=0:0:eof_action=repeat[vout]")
+    cur = "vout"
 
     filter_complex = ";".join(vf)
 
-    audio_idx = len(overlays) + 1
+    audio_idx = 2
 
     cmd += [
         "-filter_complex", filter_complex,
         "-map", f"[{cur}]",
         "-map", f"{audio_idx}:a",
         "-t", str(DURATION),
-        "-c:v", "libx264",
-        "-preset", "veryfast",
-        "-crf", "22",
-        "-pix_fmt", "yuv420p",
+        *x264_args("shorts"),
         "-c:a", "aac",
         "-b:a", "160k",
         "-movflags", "+faststart",
         str(out_mp4),
     ]
 
-    run(cmd)
+    if audio_pcm is not None:
+        run(cmd, input=np.ascontiguousarray(pcm, dtype="<f4").tobytes())
+    else:
+        run(cmd)
 
 
 def main():
+    OUT.mkdir(exist_ok=True)
+    bg_prefetch = None
+    uploads = None
     try:
         verify_auth()
 
-        # 1) BG video
-        bg = OUT / "bg.mp4"
-        download_bg_from_pexels(bg)
+        # uploads deferred by an exhausted quota drain while this run renders
+        uploads = UploadManager()
+        uploads.drain_spool()
+
+        # 1) BG video: LRU clip from the local library, conformed at ingest
+        #    (network only when it runs low)
+        try:
+            bg, bg_prefetch = acquire_bg()
+            bg_conformed = True
+        except Exception as e:
+            print(f"[WARN] BG library unavailable ({e}), downloading directly", flush=True)
+            bg = OUT / "bg.mp4"
+            download_bg_from_pexels(bg)
+            bg_conformed = False
+            try:
+                bg = conform_bg(bg, BOTTOM_H)
+                bg_conformed = True
+            except Exception as e:
+                print(f"[WARN] BG conform failed ({e}), grading per render", flush=True)
 
         # 2) Chat
         title, lines = generate_chat()
@@ -280,37 +354,36 @@ def main():
             times.append(t0 + 0.60)  # typ3
             times.append(l.t)        # full
 
-        # 4) TTS audio timeline (ONLY voices)
-        tts_dir = OUT / "tts"
-        tts_dir.mkdir(exist_ok=True)
-
-        wav_items: List[Tuple[float, Path]] = []
-        for i, l in enumerate(lines, start=1):
-            wav = tts_dir / f"m{i:02d}.wav"
+        # 4) TTS audio timeline (ONLY voices), mixed in memory
+        tts_items: List[Tuple[str, str]] = []
+        for l in lines:
             if l.who == "A":
                 spk = FEMALE_SPK
             elif l.who == "B":
                 spk = MALE_SPK
             else:
                 spk = INNER_SPK
+            tts_items.append((l.text, spk))
 
-            tts_to_wav(l.text, wav, speaker=spk)
+        clips, sr = synthesize_batch(tts_items)
 
-            # ✅ voice almost immediately after message appears
-            wav_items.append((l.t + 0.03, wav))
+        # ✅ voice almost immediately after message appears
+        mix = mix_timeline([(l.t + 0.03, c) for l, c in zip(lines, clips)], sr, total_sec=DURATION)
 
-        audio = OUT / "chat_audio.wav"
-        build_timeline_audio(wav_items, audio, total_sec=DURATION)
+        print("[TTS] Model stats:", model_stats(), flush=True)
 
-        # 5) Render final mp4
+        # 5) Render final mp4 (audio piped to the encoder)
         mp4 = OUT / "short.mp4"
-        render_final(bg, overlays, times, audio, mp4, chat_h=860)
+        if RENDER_ENGINE == "numpy":
+            render_final_numpy(bg, overlays, times, mp4, DURATION, chat_h=860, audio_pcm=(mix, sr), bg_conformed=bg_conformed)
+        else:
+            render_final(bg, overlays, times, None, mp4, chat_h=860, audio_pcm=(mix, sr), bg_conformed=bg_conformed)
 
         # 6) Upload
         hashtags = "#shorts #texting #chatstory #relatable #psychology"
         description = f"{title}\n\n{hashtags}\n"
 
-        upload_video(
+        uploads.submit(
             video_file=str(mp4),
             title=title,
             description=description,
@@ -321,10 +394,19 @@ def main():
             thumbnail_file=None,
         )
 
-        print("[OK] Uploaded successfully.", flush=True)
-
     finally:
-        cleanup_out()
+        try:
+            if uploads is not None:
+                # wait for uploads before out/ is wiped; unfinished ones stay in the spool
+                try:
+                    uploads.close()
+                finally:
+                    print(uploads.summary(), flush=True)
+        finally:
+            if bg_prefetch is not None:
+                # finish the clip in flight so it lands in the library for the next run
+                bg_prefetch.stop(timeout=300)
+            cleanup_out(keep=uploads.pending_files() if uploads is not None else ())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+import argparse
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+DEFAULT_MODULES = ["src.shorts_pipeline", "src.run_pipeline"]
+
+# "import time:       412 |       1043 |   src.shorts_audio"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Import module in a fresh interpreter with -X importtime.
+    Returns [(name, self_us, cumulative_us, depth), ...] in import order.
+    """
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if p.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{p.stderr[-4000:]}")
+
+    rows = []
+    for line in p.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            depth = (len(m.group(3)) - 1) // 2
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), depth))
+    return rows
+
+
+def report(module: str, top: int = 15) -> None:
+    rows = profile_import(module)
+    total = next((cum for name, _, cum, _ in rows if name == module), 0)
+    print(f"\n[PROFILE] import {module}: {total / 1000:.1f} ms total", flush=True)
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module", flush=True)
+    for name, self_us, cum_us, _ in sorted(rows, key=lambda r: -r[2])[:top]:
+        print(f"{cum_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}", flush=True)
+
+    ours = [r for r in rows if r[0].startswith("src.")]
+    if ours:
+        print("-- project modules --", flush=True)
+        for name, self_us, cum_us, _ in ours:
+            print(f"{cum_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Report per-module import time for the pipeline entry points.")
+    ap.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    ap.add_argument("--top", type=int, default=15)
+    args = ap.parse_args()
+
+    for m in args.modules:
+        report(m, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,11 @@ TOPICS = [
      ["Don't make me say their name."]),
 ]
 
+# Fixed replies used by the chat builder (B / inner voice)
+REPLY_SAY_IT = "Say it."
+REPLY_DONT_SEND = "Don't send it."
+FIXED_REPLIES = [REPLY_SAY_IT, REPLY_DONT_SEND]
+
 def weighted_choice():
     total = sum(w for _, w, *_ in TOPICS)
     r = random.uniform(0, total)
@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", ".cache/tts"))
+CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "2048"))
+# longer clips (whole chapters) are not stored: they would evict the sentence clips the cache is for
+CACHE_MAX_CLIP_SEC = float(os.getenv("TTS_CACHE_MAX_CLIP_SEC", "30"))
+# VITS/vctk output rate; part of the key so a model swap never serves stale clips
+CACHE_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "22050"))
+
+
+def clip_key(text: str, speaker: str, model_name: str, sample_rate: int) -> str:
+    raw = json.dumps([text, speaker, model_name, int(sample_rate)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ClipCache:
+    """
+    Content-addressed float32 clip store:
+      <root>/<key[:2]>/<key>.npy
+    - mtime is bumped on every hit, eviction drops the oldest files (LRU)
+    - writes go to a temp file in the same dir + os.replace (safe for parallel jobs)
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_mb: int = CACHE_MAX_MB):
+        self.root = Path(root)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.npy"
+
+    def get(self, text: str, speaker: str, model_name: str, sample_rate: int) -> Optional[np.ndarray]:
+        p = self._path(clip_key(text, speaker, model_name, sample_rate))
+        try:
+            samples = np.load(p, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        self.hits += 1
+        return samples
+
+    def put(self, text: str, speaker: str, model_name: str, sample_rate: int, samples: np.ndarray) -> Path:
+        p = self._path(clip_key(text, speaker, model_name, sample_rate))
+        p.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=p.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(samples, dtype=np.float32), allow_pickle=False)
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        # a full directory scan per put is wasteful during precompute
+        self._puts += 1
+        if self._puts % 32 == 1:
+            self.evict()
+        return p
+
+    def evict(self) -> int:
+        """
+        Drop least-recently-used clips until the cache fits max_bytes.
+        Returns number of files removed.
+        """
+        files = []
+        total = 0
+        for p in self.root.glob("*/*.npy"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue  # removed by another job
+            files.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        files.sort()
+        for _, size, p in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "root": str(self.root)}
+
+
+_DEFAULT: Optional[ClipCache] = None
+
+
+def default_cache() -> Optional[ClipCache]:
+    """
+    Shared cache instance; TTS_CACHE=0 disables caching entirely.
+    """
+    global _DEFAULT
+    if os.getenv("TTS_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    if _DEFAULT is None:
+        _DEFAULT = ClipCache()
+    return _DEFAULT
+
+
+def bank_sentences() -> List[str]:
+    """
+    Every sentence our scripts can produce:
+    - short chat banks (hooks/confessions/twists/cliffs) + fixed replies
+    - long story SENTENCE_BANK + chapter intros
+    """
+    from src.topic_weights import TOPICS, FIXED_REPLIES
+    from src.long_story import CHAPTER_BREATH, CHAPTER_NAMES, SENTENCE_BANK
+
+    out: List[str] = []
+    for _topic, _w, hooks, confs, twists, cliffs in TOPICS:
+        out += hooks + confs + twists + cliffs
+    out += FIXED_REPLIES
+    for sentences in SENTENCE_BANK.values():
+        out += sentences
+    out += [f"Chapter {i}. {name}." for i, name in enumerate(CHAPTER_NAMES, start=1)]
+    out.append(CHAPTER_BREATH)
+
+    seen = set()
+    return [s for s in out if not (s in seen or seen.add(s))]
+
+
+def configured_speakers() -> List[str]:
+    spk = [
+        os.getenv("SHORTS_FEMALE_SPEAKER", "p225"),
+        os.getenv("SHORTS_MALE_SPEAKER", "p226"),
+        os.getenv("SHORTS_INNER_SPEAKER", "p225"),
+        os.getenv("LONG_SPEAKER", "p225"),
+    ]
+    return list(dict.fromkeys(spk))
+
+
+def precompute(sentences: Iterable[str], speakers: Iterable[str]) -> dict:
+    from src.shorts_audio import synthesize_batch
+
+    items = [(text, spk) for spk in speakers for text in sentences]
+    t0 = time.perf_counter()
+    synthesize_batch(items)
+    cache = default_cache()
+    if cache is not None:
+        cache.evict()
+    stats = cache.stats() if cache else {}
+    stats["items"] = len(items)
+    stats["seconds"] = round(time.perf_counter() - t0, 1)
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-synthesise every bank sentence into the TTS clip cache.")
+    ap.add_argument("--speakers", nargs="*", default=None, help="default: speakers from SHORTS_*/LONG_SPEAKER env")
+    args = ap.parse_args()
+
+    speakers = args.speakers or configured_speakers()
+    sentences = bank_sentences()
+    print(f"[CACHE] Precomputing {len(sentences)} sentences x {len(speakers)} speakers -> {CACHE_DIR}", flush=True)
+    print("[CACHE]", precompute(sentences, speakers), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+import numpy as np
+
+from src.tts_models import DEFAULT_MODEL
+
+SOCKET_PATH = os.getenv("TTS_DAEMON_SOCKET", "/tmp/immersive-tts.sock")
+BATCH_WINDOW_SEC = float(os.getenv("TTS_DAEMON_BATCH_MS", "20")) / 1000.0
+BATCH_MAX_ITEMS = int(os.getenv("TTS_DAEMON_BATCH_MAX", "64"))
+# synth reply deadline = base + per character of text; past it the client falls back to in-process
+SYNTH_TIMEOUT_BASE = float(os.getenv("TTS_DAEMON_TIMEOUT_SEC", "30"))
+SYNTH_TIMEOUT_PER_CHAR = float(os.getenv("TTS_DAEMON_TIMEOUT_PER_CHAR", "0.1"))
+
+# Wire format (one request per connection):
+#   client -> {"op": "synth", "items": [[text, speaker], ...], "model": "..."}\n
+#   server -> {"ok": true, "sr": 22050, "lengths": [n0, n1, ...]}\n + float32 samples
+#   client -> {"op": "health"}\n  or  {"op": "stats"}\n
+#   server -> {"ok": true, ...}\n
+
+
+# -------- Client --------
+
+def _connect(timeout: float = 1.0) -> Optional[socket.socket]:
+    if os.getenv("TTS_DAEMON", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    if not os.path.exists(SOCKET_PATH):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(SOCKET_PATH)
+    except OSError:
+        s.close()
+        return None
+    return s
+
+
+def _request(s: socket.socket, payload: dict) -> Tuple[dict, BinaryIO]:
+    s.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+    f = s.makefile("rb")
+    header = json.loads(f.readline() or b"{}")
+    if not header.get("ok"):
+        raise RuntimeError(f"TTS daemon error: {header.get('error', 'no response')}")
+    return header, f
+
+
+def daemon_call(op: str) -> Optional[dict]:
+    """
+    health/stats query; None if no daemon is listening.
+    """
+    s = _connect()
+    if s is None:
+        return None
+    with s:
+        header, _ = _request(s, {"op": op})
+        return header
+
+
+def daemon_synthesize(
+    items: List[Tuple[str, str]],
+    model_name: str = DEFAULT_MODEL,
+) -> Optional[Tuple[List[np.ndarray], int]]:
+    """
+    Same contract as shorts_audio.synthesize_batch, served by the daemon.
+    Returns None when no daemon is reachable (caller falls back to in-process).
+    """
+    s = _connect()
+    if s is None:
+        return None
+    with s:
+        # long chapters can take minutes, a hung daemon must not block forever
+        s.settimeout(SYNTH_TIMEOUT_BASE + SYNTH_TIMEOUT_PER_CHAR * sum(len(t) for t, _ in items))
+        header, f = _request(s, {"op": "synth", "items": [list(it) for it in items], "model": model_name})
+        out = []
+        for n in header["lengths"]:
+            raw = f.read(n * 4)
+            if len(raw) != n * 4:
+                raise RuntimeError("TTS daemon closed the connection mid-response")
+            out.append(np.frombuffer(raw, dtype=np.float32))
+        return out, int(header["sr"])
+
+
+def try_tts_to_wav(text: str, wav_path: Path, speaker: str) -> bool:
+    """
+    tts_to_wav via the daemon; False if it isn't running.
+    """
+    try:
+        res = daemon_synthesize([(text, speaker)])
+    except Exception as e:
+        print(f"[WARN] TTS daemon failed, synthesising in-process: {e}", flush=True)
+        return False
+    if res is None:
+        return False
+
+    import soundfile as sf
+    (samples,), sr = res
+    sf.write(str(wav_path), samples, sr, subtype="PCM_16")
+    return True
+
+
+# -------- Server --------
+
+class _Batcher:
+    """
+    Single synthesis thread. Requests that arrive within BATCH_WINDOW_SEC of
+    each other are merged into one synthesize_batch call.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.q: "queue.Queue[dict]" = queue.Queue()
+        self.stats = {"requests": 0, "items": 0, "batches": 0, "errors": 0, "synth_sec": 0.0}
+        threading.Thread(target=self._loop, name="tts-batcher", daemon=True).start()
+
+    def submit(self, items: List[Tuple[str, str]]) -> Tuple[List[np.ndarray], int]:
+        job = {"items": items, "done": threading.Event()}
+        self.q.put(job)
+        job["done"].wait()
+        if "error" in job:
+            raise job["error"]
+        return job["result"]
+
+    def _loop(self):
+        from src.shorts_audio import synthesize_batch
+
+        while True:
+            jobs = [self.q.get()]
+            n = len(jobs[0]["items"])
+            deadline = time.monotonic() + BATCH_WINDOW_SEC
+            while n < BATCH_MAX_ITEMS:
+                try:
+                    j = self.q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                jobs.append(j)
+                n += len(j["items"])
+
+            items = [it for j in jobs for it in j["items"]]
+            t0 = time.perf_counter()
+            try:
+                arrays, sr = synthesize_batch(items, model_name=self.model_name, local=True)
+            except Exception as e:
+                self.stats["errors"] += 1
+                for j in jobs:
+                    j["error"] = e
+                    j["done"].set()
+                continue
+
+            self.stats["requests"] += len(jobs)
+            self.stats["items"] += len(items)
+            self.stats["batches"] += 1
+            self.stats["synth_sec"] += time.perf_counter() - t0
+
+            pos = 0
+            for j in jobs:
+                k = len(j["items"])
+                j["result"] = (arrays[pos:pos + k], sr)
+                pos += k
+                j["done"].set()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        srv: "TTSDaemon" = self.server  # type: ignore[assignment]
+        try:
+            req = json.loads(self.rfile.readline() or b"{}")
+            op = req.get("op")
+            if op == "health":
+                self._reply({"ok": True, "model": srv.batcher.model_name, "pid": os.getpid()})
+            elif op == "stats":
+                self._reply({"ok": True, **srv.stats()})
+            elif op == "synth":
+                if req.get("model", DEFAULT_MODEL) != srv.batcher.model_name:
+                    raise ValueError(f"daemon serves {srv.batcher.model_name}, not {req.get('model')}")
+                items = [(str(t), str(s)) for t, s in req["items"]]
+                arrays, sr = srv.batcher.submit(items)
+                self._reply({"ok": True, "sr": sr, "lengths": [len(a) for a in arrays]})
+                for a in arrays:
+                    self.wfile.write(np.ascontiguousarray(a, dtype=np.float32).tobytes())
+            else:
+                raise ValueError(f"unknown op {op!r}")
+        except Exception as e:
+            try:
+                self._reply({"ok": False, "error": str(e)})
+            except OSError:
+                pass
+
+    def _reply(self, obj: dict):
+        self.wfile.write(json.dumps(obj).encode("utf-8") + b"\n")
+
+
+class TTSDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str = SOCKET_PATH, model_name: str = DEFAULT_MODEL):
+        if os.path.exists(path):
+            # stale socket from a crashed daemon?
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                raise RuntimeError(f"TTS daemon already running on {path}")
+            except OSError:
+                os.unlink(path)
+            finally:
+                probe.close()
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+        self.path = path
+        self.started = time.time()
+        self.batcher = _Batcher(model_name)
+
+    def stats(self) -> dict:
+        from src.tts_cache import default_cache
+        from src.tts_models import model_stats
+
+        cache = default_cache()
+        return {
+            "uptime_sec": round(time.time() - self.started, 1),
+            "batcher": dict(self.batcher.stats),
+            "models": model_stats(),
+            "cache": cache.stats() if cache else None,
+        }
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def serve(path: str = SOCKET_PATH, model_name: str = DEFAULT_MODEL):
+    from src.tts_models import get_tts
+
+    get_tts(model_name)  # warm before accepting requests
+    with TTSDaemon(path, model_name) as srv:
+        print(f"[TTS] Daemon listening on {path}", flush=True)
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Warm TTS synthesis daemon (Unix socket).")
+    ap.add_argument("cmd", choices=["serve", "health", "stats"])
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        serve()
+        return
+
+    res = daemon_call(args.cmd)
+    if res is None:
+        print(f"[TTS] No daemon on {SOCKET_PATH}", flush=True)
+        raise SystemExit(1)
+    print(json.dumps(res, indent=2), flush=True)
+
+
+if __name__ == "__main__":
+    main()
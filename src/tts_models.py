@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+DEFAULT_MODEL = os.getenv("TTS_MODEL", "tts_models/en/vctk/vits")
+
+# (model_name, gpu) -> loaded TTS instance
+_MODELS: Dict[Tuple[str, bool], object] = {}
+_STATS: Dict[Tuple[str, bool], dict] = {}
+_LOCK = threading.Lock()
+
+
+def _rss_mb() -> float:
+    """
+    Current resident set size of this process (MB).
+    /proc is enough on the Linux runners; elsewhere fall back to peak RSS.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bool_env(name: str, default: str = "false") -> bool:
+    v = os.getenv(name, default).strip().lower()
+    return v in ("1", "true", "yes", "y", "on")
+
+
+def get_tts(model_name: str = DEFAULT_MODEL, gpu=None):
+    """
+    Process-wide model registry.
+    - First call for (model_name, gpu) loads the model and logs load time + memory
+    - Every later call returns the same instance
+    """
+    if gpu is None:
+        gpu = _bool_env("TTS_GPU", "false")
+    key = (model_name, bool(gpu))
+
+    tts = _MODELS.get(key)
+    if tts is not None:
+        _STATS[key]["hits"] += 1
+        return tts
+
+    with _LOCK:
+        tts = _MODELS.get(key)
+        if tts is not None:
+            _STATS[key]["hits"] += 1
+            return tts
+
+        from TTS.api import TTS
+
+        rss0 = _rss_mb()
+        t0 = time.perf_counter()
+        tts = TTS(model_name=model_name, gpu=bool(gpu), progress_bar=False)
+        load_sec = time.perf_counter() - t0
+        rss_delta = _rss_mb() - rss0
+
+        _MODELS[key] = tts
+        _STATS[key] = {"load_sec": load_sec, "rss_delta_mb": rss_delta, "hits": 0}
+        print(
+            f"[TTS] Loaded {model_name} (gpu={bool(gpu)}) in {load_sec:.1f}s, "
+            f"+{rss_delta:.0f} MB RSS",
+            flush=True,
+        )
+        return tts
+
+
+def model_stats() -> Dict[str, dict]:
+    """
+    {"model_name|gpu": {load_sec, rss_delta_mb, hits}, ...}
+    """
+    return {f"{name}|gpu={gpu}": dict(s) for (name, gpu), s in _STATS.items()}
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import os
 import random
 
-from PIL import Image, ImageDraw, ImageFont
+# PIL is imported inside the renderers so importing this module stays cheap
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw, ImageFont
 
 
 @dataclass
@@ -13,13 +20,95 @@ class Msg:
     hhmm: str
 
 
+# -------- caches (fonts, avatars, text layout) --------
+
+@lru_cache(maxsize=64)
 def _font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    from PIL import ImageFont
+
     try:
         return ImageFont.truetype(path, size)
     except Exception:
         return ImageFont.load_default()
 
 
+@lru_cache(maxsize=32)
+def _masked_avatar(avatar_path: str, size: int) -> Optional[Tuple[Image.Image, Image.Image]]:
+    """
+    (resized RGBA avatar, circular mask) or None if the file is missing/unreadable.
+    """
+    from PIL import Image, ImageDraw
+
+    p = Path(avatar_path)
+    if not p.exists():
+        return None
+    try:
+        av = Image.open(p).convert("RGBA").resize((size, size))
+    except Exception:
+        return None
+    # Make it circular
+    mask = Image.new("L", (size, size), 0)
+    md = ImageDraw.Draw(mask)
+    md.ellipse([0, 0, size, size], fill=255)
+    return av, mask
+
+
+@lru_cache(maxsize=1)
+def _measure_draw() -> ImageDraw.ImageDraw:
+    # textlength depends on the draw's font mode; RGBA matches the overlay canvas
+    from PIL import Image, ImageDraw
+
+    return ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+
+@lru_cache(maxsize=1024)
+def _wrap_text(text: str, font_path: str, font_size: int, max_w: int) -> Tuple[str, ...]:
+    """
+    Greedy word wrap, measured exactly like the renderer does.
+    Cached per (text, font, max width): a message is laid out once.
+    """
+    font = _font(font_path, font_size)
+    d = _measure_draw()
+    words = (text or "").strip().split()
+    lines: List[str] = []
+    cur = ""
+    for w in words:
+        test = (cur + " " + w).strip()
+        if d.textlength(test, font=font) <= max_w:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur)
+            cur = w
+    if cur:
+        lines.append(cur)
+    return tuple(lines)
+
+
+def overlay_content_height(paths: List[Path]) -> int:
+    """
+    Rows from the top that contain any non-transparent pixel, over all overlays
+    (rounded up to even for yuv420). Everything below is fully transparent.
+    """
+    from PIL import Image
+
+    h = 0
+    for p in paths:
+        with Image.open(p) as im:
+            bbox = im.getchannel("A").getbbox()
+        if bbox:
+            h = max(h, bbox[3])
+    return max(2, h + (h & 1))
+
+
+def cache_stats() -> dict:
+    out = {}
+    for name, fn in (("fonts", _font), ("avatars", _masked_avatar), ("layouts", _wrap_text)):
+        ci = fn.cache_info()
+        out[name] = {"hits": ci.hits, "misses": ci.misses, "size": ci.currsize}
+    return out
+
+
 THEMES = [
     ((18, 24, 28), 18),
     ((22, 18, 28), 18),
@@ -42,6 +131,9 @@ PERSONAS = [
 ]
 INNER_PERSONA = ("Inner Voice", "assets/avatars/inner.png")
 
+# Overlays are intermediates read once by ffmpeg: fast zlib, same pixels
+PNG_COMPRESS_LEVEL = 1
+
 
 def _draw_pattern(d: ImageDraw.ImageDraw, W: int, chat_h: int, style: str, seed: int):
     rng = random.Random(seed * 99991 + 17)
@@ -85,6 +177,8 @@ def _draw_whatsapp_theme(d: ImageDraw.ImageDraw, W: int, chat_h: int, seed: int)
 
 def _circle_avatar(img: Image.Image, x: int, y: int, size: int, name: str, seed: int, font_path: str):
     """Fallback avatar: colored circle + first letter."""
+    from PIL import ImageDraw
+
     rng = random.Random(seed + sum(ord(c) for c in name))
     col = (rng.randint(60, 200), rng.randint(60, 200), rng.randint(60, 200), 255)
 
@@ -98,18 +192,11 @@ def _circle_avatar(img: Image.Image, x: int, y: int, size: int, name: str, seed:
 
 
 def _paste_avatar(img: Image.Image, avatar_path: str, x: int, y: int, size: int, fallback_name: str, seed: int, font_path: str):
-    p = Path(avatar_path)
-    if p.exists():
-        try:
-            av = Image.open(p).convert("RGBA").resize((size, size))
-            # Make it circular
-            mask = Image.new("L", (size, size), 0)
-            md = ImageDraw.Draw(mask)
-            md.ellipse([0, 0, size, size], fill=255)
-            img.paste(av, (x, y), mask)
-            return
-        except Exception:
-            pass
+    cached = _masked_avatar(avatar_path, size)
+    if cached is not None:
+        av, mask = cached
+        img.paste(av, (x, y), mask)
+        return
 
     # fallback
     _circle_avatar(img, x, y, size, fallback_name, seed, font_path)
@@ -120,6 +207,8 @@ def _draw_header(img: Image.Image, name: str, avatar_path: str, seed: int, font_
     WhatsApp-like top bar with avatar + name + online.
     (No more plain 'WhatsApp' text.)
     """
+    from PIL import ImageDraw
+
     d = ImageDraw.Draw(img)
     bar_h = 120
 
@@ -149,10 +238,13 @@ def render_whatsapp_overlays(
     For each message k, produces 4 overlays:
       overlay_01_typ1.png, overlay_01_typ2.png, overlay_01_typ3.png, overlay_01.png ...
     """
+    from PIL import Image, ImageDraw
+
     out_dir.mkdir(parents=True, exist_ok=True)
 
     header_font = _font(font_path, 42)
-    msg_font = _font(font_path, 44)
+    msg_size = 44
+    msg_font = _font(font_path, msg_size)
     time_font = _font(font_path, 30)
 
     left_bg = (245, 245, 245, 235)
@@ -177,20 +269,7 @@ def render_whatsapp_overlays(
     b_name, b_avatar = random.choice([p for p in PERSONAS if p[0] != a_name])
 
     def wrap_lines(d: ImageDraw.ImageDraw, text: str, max_w: int) -> List[str]:
-        words = (text or "").strip().split()
-        lines: List[str] = []
-        cur = ""
-        for w in words:
-            test = (cur + " " + w).strip()
-            if d.textlength(test, font=msg_font) <= max_w:
-                cur = test
-            else:
-                if cur:
-                    lines.append(cur)
-                cur = w
-        if cur:
-            lines.append(cur)
-        return lines
+        return list(_wrap_text(text, font_path, msg_size, max_w))
 
     def draw_message(d: ImageDraw.ImageDraw, m: Msg, y: int) -> None:
         is_left = (m.who == "A")
@@ -244,46 +323,44 @@ def render_whatsapp_overlays(
             x = cx0 + i * gapx
             d.ellipse([x - r, cy - r, x + r, cy + r], fill=col)
 
-    def draw_screen(num_msgs_visible: int, typing_for_index: Optional[int], dots_on: int) -> Image.Image:
-        img = Image.new("RGBA", (W, H), (0, 0, 0, 0))
-        d = ImageDraw.Draw(img)
-
-        _draw_whatsapp_theme(d, W, chat_h, theme_seed)
-
-        # Header: who are we "chatting with"?
-        # If typing for INNER (we map INNER to B visually), show Inner Voice name sometimes
-        header_name = b_name
-        header_avatar = b_avatar
-        if typing_for_index is not None and typing_for_index < len(msgs):
-            # if next speaker is B, show B; otherwise show B anyway
-            pass
-
-        _draw_header(img, header_name, header_avatar, seed=theme_seed, font_path=font_path)
+    # Layers, each rasterised once:
+    #   skin    = theme + pattern + header (identical on every frame)
+    #   state_k = skin + messages[0..k-1], built by drawing message k-1 onto a copy of state_k-1
+    # Frames are copies of a state plus (for typing frames) the typing bubble.
+    # Same draw calls in the same order as a from-scratch redraw -> pixel-identical PNGs.
+    skin = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    _draw_whatsapp_theme(ImageDraw.Draw(skin), W, chat_h, theme_seed)
 
-        y = y0
-        for i in range(num_msgs_visible):
-            draw_message(d, msgs[i], y)
-            y += gap
-
-        if typing_for_index is not None and typing_for_index < len(msgs):
-            draw_typing_bubble(d, msgs[typing_for_index].who, y, dots_on=dots_on)
-
-        return img
+    # Header: who are we "chatting with"?
+    # (INNER is mapped to B visually, so the header always shows B)
+    _draw_header(skin, b_name, b_avatar, seed=theme_seed, font_path=font_path)
 
     overlays: List[Path] = []
-
-    for k in range(len(msgs)):
-        # typing frames
-        for frame, dots_on in enumerate([1, 2, 3], start=1):
-            img_t = draw_screen(num_msgs_visible=k, typing_for_index=k, dots_on=dots_on)
-            p_t = out_dir / f"overlay_{k+1:02d}_typ{frame}.png"
-            img_t.save(p_t)
-            overlays.append(p_t)
-
-        # full frame
-        img_f = draw_screen(num_msgs_visible=k + 1, typing_for_index=None, dots_on=3)
-        p_f = out_dir / f"overlay_{k+1:02d}.png"
-        img_f.save(p_f)
-        overlays.append(p_f)
-
+    pending = []
+
+    # PNG encoding dominates; Pillow releases the GIL while compressing
+    with ThreadPoolExecutor(max_workers=max(1, min(8, os.cpu_count() or 1))) as pool:
+        state = skin
+        for k in range(len(msgs)):
+            y = y0 + k * gap
+
+            # typing frames
+            for frame, dots_on in enumerate([1, 2, 3], start=1):
+                img_t = state.copy()
+                draw_typing_bubble(ImageDraw.Draw(img_t), msgs[k].who, y, dots_on=dots_on)
+                p_t = out_dir / f"overlay_{k+1:02d}_typ{frame}.png"
+                pending.append(pool.submit(img_t.save, p_t, compress_level=PNG_COMPRESS_LEVEL))
+                overlays.append(p_t)
+
+            # full frame (becomes the base for the next message)
+            state = state.copy()
+            draw_message(ImageDraw.Draw(state), msgs[k], y)
+            p_f = out_dir / f"overlay_{k+1:02d}.png"
+            pending.append(pool.submit(state.save, p_f, compress_level=PNG_COMPRESS_LEVEL))
+            overlays.append(p_f)
+
+        for f in pending:
+            f.result()
+
+    print("[OVERLAY] cache:", cache_stats(), flush=True)
     return overlays
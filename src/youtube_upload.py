@@ -1,15 +1,53 @@
+import fcntl
+import hashlib
+import json
 import os
-from typing import List, Optional
+import random
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
+from src.fileutil import link_or_copy
+
+# google-api-python-client is slow to import; only load it when uploading
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
+UPLOAD_URL = os.getenv("YT_UPLOAD_URL", "https://www.googleapis.com/upload/youtube/v3/videos")
+UPLOAD_STATE_DIR = Path(os.getenv("YT_UPLOAD_STATE_DIR", ".cache/uploads"))
+# chunks must be multiples of 256 KiB
+CHUNK_SIZE = max(1, int(os.getenv("YT_UPLOAD_CHUNK_MB", "16"))) * 1024 * 1024
+MAX_RETRIES = int(os.getenv("YT_UPLOAD_RETRIES", "10"))
+RETRIABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+# YouTube Data API units; the daily budget resets at midnight Pacific time
+QUOTA_COSTS = {"videos.insert": 1600, "thumbnails.set": 50}
+DAILY_QUOTA = int(os.getenv("YT_DAILY_QUOTA", "10000"))
+QUOTA_LEDGER = Path(os.getenv("YT_QUOTA_LEDGER", ".cache/uploads/quota.json"))
+SPOOL_DIR = Path(os.getenv("YT_UPLOAD_SPOOL", ".cache/uploads/spool"))
+# videos up to this size are hard-linked into the spool (and so into the upload cache);
+# bigger ones (long videos) stay where they were rendered
+SPOOL_MAX_MB = int(os.getenv("YT_UPLOAD_SPOOL_MAX_MB", "500"))
+# failed attempts (errors other than quota) before a spooled job is marked failed and left alone
+MAX_ATTEMPTS = int(os.getenv("YT_UPLOAD_MAX_ATTEMPTS", "3"))
+UPLOADED_INDEX = Path(os.getenv("YT_UPLOADED_INDEX", ".cache/uploads/uploaded.json"))
+UPLOAD_WORKERS = int(os.getenv("YT_UPLOAD_WORKERS", "2"))
+UPLOAD_MIN_INTERVAL = float(os.getenv("YT_UPLOAD_MIN_INTERVAL", "5"))  # seconds between insert starts
+TOKEN_REFRESH_MARGIN = int(os.getenv("YT_TOKEN_REFRESH_MARGIN", "300"))  # seconds before expiry
+
+
+def _get_creds() -> "Credentials":
+    from google.oauth2.credentials import Credentials
 
-def _get_creds() -> Credentials:
     return Credentials(
         token=None,
         refresh_token=os.environ["YT_REFRESH_TOKEN"],
@@ -20,9 +58,89 @@ def _get_creds() -> Credentials:
     )
 
 
+# one credential / HTTP session / API client per process, shared by every upload thread
+_auth_lock = threading.Lock()
+_creds: Optional["Credentials"] = None
+_session = None
+_service = None
+
+
+def get_credentials() -> "Credentials":
+    """Refreshes only when there is no token yet or it expires within TOKEN_REFRESH_MARGIN."""
+    global _creds
+    from google.auth.transport.requests import Request
+
+    with _auth_lock:
+        if _creds is None:
+            _creds = _get_creds()
+        expiry = _creds.expiry  # naive UTC
+        if not _creds.token or expiry is None or (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds() < TOKEN_REFRESH_MARGIN:
+            try:
+                _creds.refresh(Request())
+            except Exception as e:
+                print(
+                    "[ERROR] OAuth refresh failed. Token may be expired/revoked.\n"
+                    f"Reason: {e}",
+                    flush=True,
+                )
+                raise
+            print(f"[AUTH] Access token refreshed (expires {_creds.expiry:%H:%M:%S} UTC)", flush=True)
+        return _creds
+
+
 def verify_auth() -> None:
-    creds = _get_creds()
-    creds.refresh(Request())
+    # fail fast if the refresh token is dead/revoked; the token is kept for the uploads
+    get_credentials()
+
+
+def authorized_session():
+    """AuthorizedSession over get_credentials(), pool sized for the upload workers."""
+    global _session
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    creds = get_credentials()
+    with _auth_lock:
+        if _session is None:
+            _session = AuthorizedSession(creds)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, 2 * UPLOAD_WORKERS))
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class _SessionHttp:
+    """httplib2.Http stand-in for googleapiclient that sends through the shared AuthorizedSession."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        import httplib2
+
+        r = self.session.request(method, uri, data=body, headers=headers, timeout=120)
+        resp = httplib2.Response({"status": r.status_code, **{k.lower(): v for k, v in r.headers.items()}})
+        resp.reason = r.reason
+        return resp, r.content
+
+    def close(self):
+        pass
+
+
+def youtube_service():
+    """
+    YouTube Data API client, built once from the discovery document bundled
+    with google-api-python-client (no discovery fetch) on the shared session.
+    """
+    global _service
+    from googleapiclient import discovery_cache
+    from googleapiclient.discovery import build_from_document
+
+    http = _SessionHttp(authorized_session())
+    with _auth_lock:
+        if _service is None:
+            _service = build_from_document(discovery_cache.get_static_doc("youtube", "v3"), http=http)
+        return _service
 
 
 def _bool_env(name: str, default: str = "false") -> bool:
@@ -30,7 +148,179 @@ def _bool_env(name: str, default: str = "false") -> bool:
     return v in ("1", "true", "yes", "y", "on")
 
 
+class UploadError(Exception):
+    pass
+
+
+class QuotaExceeded(UploadError):
+    """Out of API quota (our ledger or YouTube's quotaExceeded); retry on a later day."""
+
+
+class ResumableUpload:
+    """
+    YouTube resumable upload protocol on a requests-style session
+    (google.auth AuthorizedSession in production, any Session against a stand-in):
+    - the session URI, file identity and chunk size are persisted in a state
+      file, so a restarted process resumes instead of starting from byte 0
+    - on resume (and after every failure) the server is asked which bytes it
+      has (PUT, Content-Range: bytes */size) and upload continues from there
+    - transient errors (connection errors, 408/429/5xx) are retried with
+      exponential backoff + jitter, up to MAX_RETRIES in a row
+    - before_start() runs only when a new session is about to be created
+      (the point where YouTube charges videos.insert); it may raise QuotaExceeded
+    """
+
+    def __init__(
+        self,
+        session,
+        video_file: str,
+        body: dict,
+        params: dict,
+        chunk_size: int = CHUNK_SIZE,
+        state_dir: Path = UPLOAD_STATE_DIR,
+        before_start: Optional[Callable[[], None]] = None,
+    ):
+        self.session = session
+        self.before_start = before_start
+        self.path = Path(video_file)
+        self.body = body
+        self.params = params
+        self.size = self.path.stat().st_size
+        # content identity, not path/mtime: the spool entry holding the video is
+        # renamed on every claim and the file comes back from actions/cache
+        with open(self.path, "rb") as f:
+            head = hashlib.sha1(f.read(1 << 20)).hexdigest()
+        ident = f"{self.path.name}|{self.size}|{head}"
+        self.state_path = state_dir / f"{hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]}.json"
+        self.chunk_size = chunk_size
+        self.session_uri: Optional[str] = None
+
+    # -------- state file --------
+
+    def _load_state(self) -> bool:
+        try:
+            st = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if st.get("size") != self.size or not st.get("session_uri"):
+            return False
+        self.session_uri = st["session_uri"]
+        self.chunk_size = int(st.get("chunk_size") or self.chunk_size)
+        return True
+
+    def _save_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "file": str(self.path),
+            "size": self.size,
+            "session_uri": self.session_uri,
+            "chunk_size": self.chunk_size,
+            "created": time.time(),
+        }))
+        os.replace(tmp, self.state_path)
+
+    # -------- protocol --------
+
+    def _start(self):
+        if self.before_start is not None:
+            self.before_start()
+        r = self.session.post(
+            UPLOAD_URL,
+            params={"uploadType": "resumable", **self.params},
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "X-Upload-Content-Type": "video/mp4",
+                "X-Upload-Content-Length": str(self.size),
+            },
+            data=json.dumps(self.body),
+            timeout=60,
+        )
+        if r.status_code in RETRIABLE_STATUS:
+            raise ConnectionError(f"session start: HTTP {r.status_code}")
+        if r.status_code == 403 and "quotaExceeded" in r.text:
+            raise QuotaExceeded(f"session start: YouTube quota exceeded {r.text[:200]}")
+        if r.status_code != 200 or "Location" not in r.headers:
+            raise UploadError(f"session start failed: HTTP {r.status_code} {r.text[:500]}")
+        self.session_uri = r.headers["Location"]
+        self._save_state()
+        print(f"[UPLOAD] Session started ({self.size} bytes, chunk {self.chunk_size / 2**20:g} MB)", flush=True)
+
+    def _handle(self, r):
+        """Returns ("done", json) or ("offset", next_byte)."""
+        if r.status_code in (200, 201):
+            return "done", r.json()
+        if r.status_code == 308:
+            rng = r.headers.get("Range")  # "bytes=0-12345"
+            return "offset", int(rng.rsplit("-", 1)[1]) + 1 if rng else 0
+        if r.status_code in (404, 410):
+            # session expired / unknown: start over with a new one
+            self.session_uri = None
+            raise ConnectionError(f"upload session gone (HTTP {r.status_code})")
+        if r.status_code in RETRIABLE_STATUS:
+            raise ConnectionError(f"HTTP {r.status_code}")
+        raise UploadError(f"upload failed: HTTP {r.status_code} {r.text[:500]}")
+
+    def _query(self):
+        r = self.session.put(
+            self.session_uri,
+            headers={"Content-Range": f"bytes */{self.size}", "Content-Length": "0"},
+            timeout=60,
+        )
+        return self._handle(r)
+
+    def _put_chunk(self, offset: int):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read(self.chunk_size)
+        end = offset + len(data) - 1
+        r = self.session.put(
+            self.session_uri,
+            headers={"Content-Range": f"bytes {offset}-{end}/{self.size}", "Content-Type": "video/mp4"},
+            data=data,
+            timeout=300,
+        )
+        return self._handle(r)
+
+    def run(self) -> dict:
+        import requests
+
+        resumed = self._load_state()
+        failures = 0
+        step = None  # ("done", response) | ("offset", next_byte)
+        while True:
+            try:
+                if self.session_uri is None:
+                    self._start()
+                    step = ("offset", 0)
+                elif step is None:
+                    step = self._query()
+                    if resumed:
+                        print(f"[UPLOAD] Resuming at byte {step[1] if step[0] == 'offset' else self.size}/{self.size}", flush=True)
+                        resumed = False
+
+                if step[0] == "done":
+                    break
+                step = self._put_chunk(step[1])
+                failures = 0
+                if step[0] == "offset":
+                    print(f"Upload progress: {int(step[1] * 100 / max(1, self.size))}%", flush=True)
+            except (ConnectionError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                failures += 1
+                if failures > MAX_RETRIES:
+                    raise UploadError(f"giving up after {MAX_RETRIES} retries: {e}") from e
+                delay = min(64.0, 2 ** (failures - 1)) + random.random()
+                print(f"[WARN] Upload error ({e}); retry {failures}/{MAX_RETRIES} in {delay:.1f}s", flush=True)
+                time.sleep(delay)
+                step = None  # ask the server what it has before sending more
+
+        self.state_path.unlink(missing_ok=True)
+        return step[1]
+
+
 def set_thumbnail(youtube, video_id: str, thumbnail_file: str) -> None:
+    from googleapiclient.http import MediaFileUpload
+
     request = youtube.thumbnails().set(
         videoId=video_id,
         media_body=MediaFileUpload(thumbnail_file),
@@ -48,21 +338,11 @@ def upload_video(
     category_id: str = "22",
     language: str = "en",
     thumbnail_file: Optional[str] = None,
+    before_start: Optional[Callable[[], None]] = None,
 ) -> str:
-    creds = _get_creds()
-
-    # Fail fast if token is dead/revoked
-    try:
-        creds.refresh(Request())
-    except Exception as e:
-        print(
-            "[ERROR] OAuth refresh failed. Token may be expired/revoked.\n"
-            f"Reason: {e}",
-            flush=True,
-        )
-        raise
-
-    youtube = build("youtube", "v3", credentials=creds)
+    # cached token (refreshed only near expiry) + the process-wide session and client
+    session = authorized_session()
+    youtube = youtube_service()
     notify_subscribers = _bool_env("YT_NOTIFY_SUBSCRIBERS", "false")
 
     body = {
@@ -80,20 +360,14 @@ def upload_video(
         },
     }
 
-    media = MediaFileUpload(video_file, mimetype="video/mp4", resumable=True)
-
-    request = youtube.videos().insert(
-        part="snippet,status",
-        body=body,
-        media_body=media,
-        notifySubscribers=notify_subscribers,
-    )
-
-    response = None
-    while response is None:
-        status, response = request.next_chunk()
-        if status:
-            print(f"Upload progress: {int(status.progress() * 100)}%", flush=True)
+    # resumable session persisted under YT_UPLOAD_STATE_DIR; retried + resumed on failure
+    response = ResumableUpload(
+        session,
+        video_file,
+        body,
+        params={"part": "snippet,status", "notifySubscribers": str(notify_subscribers).lower()},
+        before_start=before_start,
+    ).run()
 
     video_id = response["id"]
     print("Uploaded video id:", video_id, flush=True)
@@ -108,3 +382,308 @@ def upload_video(
             print("[WARN] Thumbnail set failed:", e, flush=True)
 
     return video_id
+
+
+# -------- quota ledger + upload manager --------
+
+def _quota_day() -> str:
+    from zoneinfo import ZoneInfo
+
+    return datetime.now(ZoneInfo("America/Los_Angeles")).date().isoformat()
+
+
+@contextmanager
+def _flocked(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix(".lock"), "a+") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+def _write_json(path: Path, obj):
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(obj, indent=2))
+    os.replace(tmp, path)
+
+
+class QuotaLedger:
+    """
+    API units spent today by the processes that share this ledger file.
+    The flock only serialises processes on one machine: in CI every workflow
+    keeps its own ledger in its own upload cache, so YT_DAILY_QUOTA is that
+    workflow's share of the project quota, not the project total.
+    """
+
+    def __init__(self, path: Path = QUOTA_LEDGER, daily: int = DAILY_QUOTA):
+        self.path = path
+        self.daily = daily
+
+    def _read(self) -> dict:
+        today = _quota_day()
+        try:
+            st = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            st = {}
+        if st.get("day") != today:
+            st = {"day": today, "used": 0, "calls": {}}
+        return st
+
+    def try_charge(self, calls: Dict[str, int]) -> bool:
+        """Charges all calls at once if they fit in today's budget; False otherwise."""
+        units = sum(QUOTA_COSTS[c] * n for c, n in calls.items())
+        with _flocked(self.path):
+            st = self._read()
+            if st["used"] + units > self.daily:
+                return False
+            st["used"] += units
+            for c, n in calls.items():
+                st["calls"][c] = st["calls"].get(c, 0) + n
+            _write_json(self.path, st)
+        return True
+
+    def remaining(self) -> int:
+        with _flocked(self.path):
+            return self.daily - self._read()["used"]
+
+
+@dataclass
+class UploadJob:
+    video_file: str
+    title: str
+    description: str
+    tags: List[str] = field(default_factory=list)
+    privacy_status: str = "unlisted"
+    category_id: str = "22"
+    language: str = "en"
+    thumbnail_file: Optional[str] = None
+
+
+_CLAIM = ".claimed-"
+
+
+def _claim_name(entry_id: str) -> str:
+    return f"{entry_id}{_CLAIM}{socket.gethostname()}-{os.getpid()}"
+
+
+def _claim_is_live(name: str) -> bool:
+    """A claim held by a running process on this machine (anything else is left over from a dead run)."""
+    owner = name.split(_CLAIM, 1)[1]
+    host, _, pid = owner.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class UploadManager:
+    """
+    Uploads finished videos in the background while the pipeline keeps working.
+    Every upload is an entry under SPOOL_DIR (job.json + the video, hard-linked
+    when it is at most SPOOL_MAX_MB, otherwise referenced where it was rendered):
+    - an entry is owned by renaming it to <id>.claimed-<host>-<pid>; pending
+      entries and claims of dead processes are picked up by drain_spool()
+    - before the entry is removed, the video id is written into job.json and
+      into UPLOADED_INDEX, so a restored older snapshot never uploads it again
+    - at most `workers` uploads at once, insert starts spaced by UPLOAD_MIN_INTERVAL
+    - videos.insert + thumbnails.set are charged against QuotaLedger only when
+      a new resumable session is created; over budget the entry is released
+      and stays pending
+    - other errors count as attempts; after MAX_ATTEMPTS the entry is renamed
+      <id>.failed and no longer retried
+    - close() waits for everything and re-raises the first error of this run's
+      own uploads (spooled jobs from earlier runs only log); `counts` has
+      uploaded / deferred / failed
+    """
+
+    def __init__(
+        self,
+        workers: int = UPLOAD_WORKERS,
+        ledger: Optional[QuotaLedger] = None,
+        spool_dir: Path = SPOOL_DIR,
+        index_path: Path = UPLOADED_INDEX,
+    ):
+        self.ledger = ledger or QuotaLedger()
+        self.spool_dir = spool_dir
+        self.index_path = index_path
+        self._ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yt-upload")
+        self._futures: List[Future] = []
+        self._slot_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._pending_lock = threading.Lock()
+        self._pending_files: set = set()
+        self.counts = {"uploaded": 0, "deferred": 0, "failed": 0}
+
+    # -------- entries --------
+
+    def submit(self, **kwargs) -> Future:
+        """Same arguments as upload_video; the future resolves to the video id, or None if deferred."""
+        job = UploadJob(**kwargs)
+        entry_id = f"{int(time.time())}_{hashlib.sha1(f'{job.video_file}|{job.title}'.encode('utf-8')).hexdigest()[:8]}"
+        d = self.spool_dir / _claim_name(entry_id)
+        d.mkdir(parents=True)
+
+        rec = asdict(job)
+        rec["id"] = entry_id
+        video = Path(job.video_file)
+        if video.stat().st_size <= SPOOL_MAX_MB * 1024 * 1024:
+            link_or_copy(video, d / video.name)
+            rec["video_file"] = video.name
+        else:
+            rec["video_file"] = str(video.resolve())
+            self._track(rec["video_file"], True)
+        if job.thumbnail_file and os.path.exists(job.thumbnail_file):
+            link_or_copy(Path(job.thumbnail_file), d / Path(job.thumbnail_file).name)
+            rec["thumbnail_file"] = Path(job.thumbnail_file).name
+        else:
+            rec["thumbnail_file"] = None
+        _write_json(d / "job.json", rec)
+
+        fut = self._ex.submit(self._run, d)
+        self._futures.append(fut)
+        return fut
+
+    def drain_spool(self) -> int:
+        """Claims and queues pending entries (and ones whose claim died with its process), oldest first."""
+        if not self.spool_dir.is_dir():
+            return 0
+        n = 0
+        for d in sorted(self.spool_dir.iterdir()):
+            if d.name.endswith(".failed") or not (d / "job.json").exists() or (_CLAIM in d.name and _claim_is_live(d.name)):
+                continue
+            entry_id = d.name.split(_CLAIM, 1)[0]
+            mine = self.spool_dir / _claim_name(entry_id)
+            try:
+                os.rename(d, mine)
+            except FileNotFoundError:
+                continue  # claimed by another process first
+            # a job from an earlier run is retried quietly; only this run's own uploads fail close()
+            self._futures.append(self._ex.submit(self._run, mine, False))
+            n += 1
+        if n:
+            print(f"[UPLOAD] {n} spooled upload(s) queued", flush=True)
+        return n
+
+    def pending_files(self) -> set:
+        """Videos outside the spool whose upload has not finished; cleanup must keep them."""
+        with self._pending_lock:
+            return set(self._pending_files)
+
+    def _track(self, path: str, pending: bool):
+        with self._pending_lock:
+            (self._pending_files.add if pending else self._pending_files.discard)(path)
+
+    def summary(self) -> str:
+        """One line for the end of a run: uploaded / deferred (still spooled) / failed."""
+        c = self.counts
+        return f"[UPLOAD] {c['uploaded']} uploaded, {c['deferred']} deferred to a later run, {c['failed']} failed"
+
+    def _count(self, key: str):
+        with self._pending_lock:
+            self.counts[key] += 1
+
+    def _release(self, d: Path, rec: dict):
+        os.rename(d, self.spool_dir / rec["id"])
+
+    def _uploaded(self) -> dict:
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _mark_uploaded(self, d: Path, rec: dict, video_id: str):
+        rec["video_id"] = video_id
+        _write_json(d / "job.json", rec)
+        with _flocked(self.index_path):
+            idx = self._uploaded()
+            idx[rec["id"]] = video_id
+            _write_json(self.index_path, dict(list(idx.items())[-500:]))
+        shutil.rmtree(d, ignore_errors=True)
+
+    # -------- worker --------
+
+    def _wait_slot(self):
+        with self._slot_lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + UPLOAD_MIN_INTERVAL
+        if start > now:
+            time.sleep(start - now)
+
+    def _run(self, d: Path, raise_errors: bool = True) -> Optional[str]:
+        rec = json.loads((d / "job.json").read_text())
+        done = rec.get("video_id") or self._uploaded().get(rec["id"])
+        if done:
+            print(f"[UPLOAD] {rec['id']} already uploaded as {done}, dropping entry", flush=True)
+            shutil.rmtree(d, ignore_errors=True)
+            return done
+
+        video = Path(rec["video_file"]) if os.path.isabs(rec["video_file"]) else d / rec["video_file"]
+        thumb = d / rec["thumbnail_file"] if rec.get("thumbnail_file") else None
+        if not video.exists():
+            print(f"[WARN] {rec['id']}: video {video} is gone, dropping upload", flush=True)
+            shutil.rmtree(d, ignore_errors=True)
+            self._count("failed")
+            return None
+
+        def charge():
+            # only a new resumable session costs videos.insert; resuming one is free
+            calls = {"videos.insert": 1}
+            if thumb is not None:
+                calls["thumbnails.set"] = 1
+            if not self.ledger.try_charge(calls):
+                raise QuotaExceeded(f"daily quota exhausted ({self.ledger.remaining()} units left)")
+
+        self._wait_slot()
+        job = UploadJob(**{k: v for k, v in rec.items() if k in UploadJob.__dataclass_fields__})
+        job.video_file = str(video)
+        job.thumbnail_file = str(thumb) if thumb is not None else None
+        try:
+            video_id = upload_video(**asdict(job), before_start=charge)
+        except QuotaExceeded as e:
+            self._release(d, rec)
+            self._count("deferred")
+            print(f"[UPLOAD] {e}; {rec['id']} stays spooled", flush=True)
+            return None
+        except Exception as e:
+            rec["attempts"] = rec.get("attempts", 0) + 1
+            rec["last_error"] = str(e)[:500]
+            _write_json(d / "job.json", rec)
+            if rec["attempts"] >= MAX_ATTEMPTS:
+                os.rename(d, self.spool_dir / f"{rec['id']}.failed")
+                self._count("failed")
+                print(f"[ERROR] {rec['id']} failed {rec['attempts']} times, giving up (kept as {rec['id']}.failed): {e}", flush=True)
+            else:
+                self._release(d, rec)
+                self._count("deferred")
+                print(f"[WARN] {rec['id']} attempt {rec['attempts']}/{MAX_ATTEMPTS} failed, will retry next run: {e}", flush=True)
+            if raise_errors:
+                raise
+            return None
+
+        self._mark_uploaded(d, rec, video_id)
+        if os.path.isabs(rec["video_file"]):
+            self._track(rec["video_file"], False)
+        self._count("uploaded")
+        return video_id
+
+    def close(self) -> List[Optional[str]]:
+        self._ex.shutdown(wait=True)
+        results, first_error = [], None
+        for f in self._futures:
+            try:
+                results.append(f.result())
+            except Exception as e:
+                print(f"[ERROR] Upload failed: {e}", flush=True)
+                results.append(None)
+                first_error = first_error or e
+        if first_error is not None:
+            raise first_error
+        return results